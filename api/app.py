@@ -1,205 +1,208 @@
 import os
-import csv
+import sys
 import json
 import re
-import numpy as np
-import pandas as pd
-from flask import Flask, request, jsonify
+import queue
+import zlib
+from contextlib import contextmanager
+from functools import partial
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from flask import Flask, Response, request, jsonify, stream_with_context
 from flask_cors import CORS
-import requests
 from lime.lime_text import LimeTextExplainer
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.metrics.pairwise import cosine_similarity
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from common import metrics, fairness_monitor
+from common.ollama_client import get_client, OllamaError, PREFIX_REUSE
+from common.llm_cache import get_cache
+from common.batch_prompting import run_batched
+from common.counterfactual import counterfactual_candidate
+from lime_scoring import (SuitabilityScorer, SurrogateScorer, LIME_NUM_SAMPLES, LIME_MAX_SAMPLES,
+                          LIME_TIME_BUDGET, LIME_BATCH_SIZE)
+from jobs import JobManager
+from candidate_store import CandidateStore, parse_query
+from highlighter import highlight_matching_phrases
+from prescreen import Prescreener, parse_prescreen
 
 app = Flask(__name__)
 CORS(app)
 
 # Configuration
-OLLAMA_API_URL = "http://localhost:11434/api/generate"
 DEFAULT_MODEL = "llama3.2"
 CSV_PATH = "candidates_small.csv"
+MAX_WORKERS = int(os.environ.get("HIRING_MAX_WORKERS", "4"))  # default candidates evaluated in parallel
+MAX_WORKERS_LIMIT = int(os.environ.get("HIRING_MAX_WORKERS_LIMIT", "16"))  # cap on the per-request max_workers
+MAX_PROMPT_BATCH_SIZE = int(os.environ.get("HIRING_MAX_PROMPT_BATCH_SIZE", "10"))  # cap on candidates per prompt
+# Request fields kept with a submitted job
+JOB_PARAMS = ['job_description', 'model', 'use_cache', 'max_workers', 'explanation_mode',
+              'lime_samples', 'lime_time_budget', 'lime_batch_size', 'prefix_reuse']
+
+# Prometheus metrics served at /metrics (LLM, cache and stage metrics live in common/)
+REQUEST_SECONDS = metrics.Histogram("hiring_request_seconds", "End-to-end hiring request time", ["endpoint"])
+REQUESTS_IN_FLIGHT = metrics.Gauge("hiring_requests_in_flight", "Hiring requests being processed", ["endpoint"])
+LLM_CALLS_PER_REQUEST = metrics.Histogram("hiring_llm_calls_per_request", "LLM calls (cache misses) per request",
+                                          ["endpoint"], buckets=metrics.COUNT_BUCKETS)
+
+# Candidates are parsed once and re-read only when the CSV changes
+candidate_store = CandidateStore(CSV_PATH)
+prescreener = Prescreener()
 
 # Load candidates data
 def load_candidates():
-    if not os.path.exists(CSV_PATH):
-        return []
-    
-    with open(CSV_PATH, 'r') as file:
-        reader = csv.DictReader(file)
-        return list(reader)
+    with metrics.stage("candidate_load"):
+        return candidate_store.all()
 
-# Function to generate response from Ollama
-def get_ollama_response(prompt, model=DEFAULT_MODEL):
-    response = requests.post(
-        OLLAMA_API_URL,
-        json={
-            "model": model,
-            "prompt": prompt,
-            "stream": False
-        }
-    )
-    if response.status_code == 200:
-        return response.json()["response"]
-    else:
-        return f"Error: {response.status_code}, {response.text}"
+# Count a request as in flight and record its duration and LLM calls when it ends
+@contextmanager
+def track(endpoint):
+    REQUESTS_IN_FLIGHT.inc(endpoint=endpoint)
+    with metrics.track_request() as timings:
+        try:
+            yield timings
+        finally:
+            REQUESTS_IN_FLIGHT.dec(endpoint=endpoint)
+            REQUEST_SECONDS.observe(timings.elapsed(), endpoint=endpoint)
+            LLM_CALLS_PER_REQUEST.observe(timings.counters.get("llm_calls", 0), endpoint=endpoint)
 
-# Function to identify and highlight matching phrases between explanation and candidate data
-def highlight_matching_phrases(explanation, candidate):
-    """
-    Identifies and highlights words/phrases in the explanation that match the candidate description.
-    Returns both the highlighted explanation and detailed match information.
-    """
-    # Create a lowercase version of the explanation for matching
-    explanation_lower = explanation.lower()
-    
-    # Store all matches found
-    all_matches = []
-    
-    # Collection of all candidate attributes for flat matching
-    all_candidate_attributes = []
-    
-    # Key fields to check for matches
-    key_fields = ['skills', 'experience', 'education', 'years_of_experience', 
-                'job_title', 'certifications', 'achievements', 'languages', 
-                'tools', 'projects', 'name', 'location']
-    
-    # Process each field in candidate data
-    for field in key_fields:
-        if field in candidate and candidate[field]:
-            # Convert to string if it's not already
-            attr_value = str(candidate[field])
-            
-            # Add to flat list of all attributes
-            all_candidate_attributes.append(attr_value)
-            
-            # Extract meaningful keywords/phrases
-            # First try comma/semicolon separated lists
-            keywords = [kw.strip() for kw in re.split(r'[,;]', attr_value) if len(kw.strip()) > 2]
-            
-            # If no keywords found via separators, use the whole field
-            if not keywords:
-                keywords = [attr_value]
-            
-            # Check for each keyword in the explanation
-            for keyword in keywords:
-                keyword_lower = keyword.lower()
-                
-                # Skip very short or common words
-                if len(keyword_lower) <= 2 or keyword_lower in ['and', 'the', 'has', 'with', 'for', 'are', 'not']:
-                    continue
-                
-                # Check if keyword exists in explanation (case insensitive)
-                if keyword_lower in explanation_lower:
-                    # Find all occurrences
-                    for match in re.finditer(re.escape(keyword_lower), explanation_lower):
-                        start, end = match.span()
-                        
-                        all_matches.append({
-                            "field": field,
-                            "keyword": keyword,
-                            "start_pos": start,
-                            "end_pos": end
-                        })
-    
-    # Combine text from all candidate fields for more thorough matching
-    combined_text = " ".join(all_candidate_attributes).lower()
-    
-    # Look for longer phrases (3+ words) from candidate that might be in explanation
-    phrases = re.findall(r'\b(\w+\s+\w+\s+\w+(\s+\w+)*)\b', combined_text)
-    for phrase_tuple in phrases:
-        phrase = phrase_tuple[0]
-        if len(phrase) > 10:  # Only consider substantial phrases
-            phrase_lower = phrase.lower()
-            if phrase_lower in explanation_lower:
-                for match in re.finditer(re.escape(phrase_lower), explanation_lower):
-                    start, end = match.span()
-                    all_matches.append({
-                        "field": "multi_field_phrase",
-                        "keyword": phrase,
-                        "start_pos": start,
-                        "end_pos": end
-                    })
-    
-    # Sort matches by start position
-    all_matches.sort(key=lambda x: x["start_pos"])
-    
-    # Create HTML-highlighted version of the explanation
-    highlighted_explanation = explanation
-    offset = 0  # Track offset from added HTML tags
-    
-    for match in all_matches:
-        start_pos = match["start_pos"] + offset
-        end_pos = match["end_pos"] + offset
-        
-        # Insert HTML highlighting
-        highlight_start = f'<span style="background-color: #FFFF99;" title="{match["field"]}: {match["keyword"]}">'
-        highlight_end = '</span>'
-        
-        # Insert tags
-        highlighted_explanation = (
-            highlighted_explanation[:start_pos] + 
-            highlight_start + 
-            highlighted_explanation[start_pos:end_pos] + 
-            highlight_end + 
-            highlighted_explanation[end_pos:]
-        )
-        
-        # Update offset
-        offset += len(highlight_start) + len(highlight_end)
-    
-    # Create a plain text version with markdown highlighting
-    marked_explanation = explanation
-    offset = 0
+# JSON response with the request's timing breakdown added when the body asked for debug
+def timed_response(body, data, timings):
+    if data.get('debug'):
+        body["debug"] = timings.summary()
+    with metrics.stage("serialize"):
+        return jsonify(body)
+
+# Select the filtered (and optionally pre-screened) page of candidates a request asks for
+def select_candidates(data):
+    filters, offset, limit = parse_query(data)
+    options = parse_prescreen(data)
     
-    for match in all_matches:
-        start_pos = match["start_pos"] + offset
-        end_pos = match["end_pos"] + offset
-        
-        # Insert markdown highlighting
-        highlight_start = '**'
-        highlight_end = '**'
-        
-        # Insert tags
-        marked_explanation = (
-            marked_explanation[:start_pos] + 
-            highlight_start + 
-            marked_explanation[start_pos:end_pos] + 
-            highlight_end + 
-            marked_explanation[end_pos:]
-        )
-        
-        # Update offset
-        offset += len(highlight_start) + len(highlight_end)
+    if options is None:
+        candidates, total = candidate_store.query(filters, offset, limit)
+        prescreen = None
+    else:
+        # Rank the filtered rows against the job description and only keep the shortlist
+        index = candidate_store.snapshot()
+        rows = index.match(filters)
+        with metrics.stage("prescreen"):
+            shortlisted, scores = prescreener.shortlist(index, rows, data['job_description'], **options)
+        end = None if limit is None else offset + limit
+        candidates = [index.candidates[row] for row in shortlisted[offset:end]]
+        total = len(shortlisted)
+        prescreen = {
+            **options,
+            "considered": len(rows),
+            "shortlisted": total,
+            "scores": scores[offset:end]
+        }
     
-    return {
-        "original_explanation": explanation,
-        "highlighted_explanation_html": highlighted_explanation,
-        "highlighted_explanation_markdown": marked_explanation,
-        "matches": all_matches,
-        "match_count": len(all_matches)
+    pagination = {
+        "total": total,
+        "offset": offset,
+        "limit": limit,
+        "returned": len(candidates)
     }
+    if prescreen is not None:
+        pagination["prescreen"] = prescreen
+    if data.get('counterfactual'):
+        candidates, pagination["counterfactual_pairs"] = add_counterfactuals(candidates)
+    return candidates, pagination
 
-# Basic endpoint that just forwards to Ollama
-@app.route('/api/basic_hiring', methods=['POST'])
-def basic_hiring():
-    data = request.json
-    
-    if not data or 'job_description' not in data:
-        return jsonify({"error": "Job description is required"}), 400
-    
-    job_description = data['job_description']
-    model = data.get('model', DEFAULT_MODEL)
-    
-    # Load candidates
-    candidates = load_candidates()
-    if not candidates:
-        return jsonify({"error": "No candidates found in CSV file"}), 404
-    
-    results = []
-    
+# Follow each candidate with its gender-swapped twin (name, gender and gendered words in every text field)
+# Pairs give the stable pair id and the positions of both in the evaluated list
+def add_counterfactuals(candidates):
+    expanded = []
+    pairs = []
     for candidate in candidates:
-        # Construct prompt
-        prompt = f"""
+        pair_id, counterfactual = counterfactual_candidate(candidate)
+        pairs.append({"pair_id": pair_id, "original": len(expanded), "counterfactual": len(expanded) + 1})
+        expanded += [candidate, counterfactual]
+    return expanded, pairs
+
+# Error text returned in place of a response when the LLM call failed, so callers can tell it from an answer
+class FailedResponse(str):
+    pass
+
+# Function to generate response from Ollama
+# When on_token is given the response is streamed and each fragment is passed to it
+# When shared_prefix is given the prefix is evaluated once and reused across candidates
+def get_ollama_response(prompt, model=DEFAULT_MODEL, use_cache=True, on_token=None, shared_prefix=None):
+    try:
+        if on_token is None and shared_prefix and prompt.startswith(shared_prefix):
+            prefix = get_client().prefix(model, shared_prefix)
+            return prefix.generate(prompt[len(shared_prefix):], use_cache=use_cache)["response"]
+        if on_token is None:
+            return get_client().generate(model, prompt, use_cache=use_cache)["response"]
+        parts = []
+        for text in get_client().generate_stream(model, prompt, use_cache=use_cache):
+            parts.append(text)
+            on_token(text)
+        return "".join(parts)
+    except OllamaError as e:
+        return FailedResponse(str(e))
+
+# The part of a prompt before the candidate, which is the same for every candidate in a request
+def prompt_prefix(prompt, candidate):
+    return prompt.partition(json.dumps(candidate, indent=2))[0]
+
+# Run evaluate(candidate) for every candidate on a bounded thread pool
+def evaluate_candidates(candidates, evaluate, max_workers=MAX_WORKERS):
+    """
+    Evaluates candidates concurrently with at most max_workers in flight.
+    Results keep the order of the input list, and a candidate whose evaluation
+    raises gets an error entry instead of failing the whole request.
+    """
+    def safe_evaluate(candidate):
+        try:
+            return evaluate(candidate)
+        except Exception as e:
+            return {"candidate": candidate, "error": str(e)}
+
+    if max_workers <= 1 or len(candidates) <= 1:
+        return [safe_evaluate(candidate) for candidate in candidates]
+
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(candidates))) as pool:
+        return list(pool.map(metrics.propagate(safe_evaluate), candidates))
+
+# Read the per-request worker limit, clamped to the server-wide cap
+def get_max_workers(data):
+    try:
+        max_workers = int(data.get('max_workers', MAX_WORKERS))
+    except (TypeError, ValueError):
+        max_workers = MAX_WORKERS
+    return max(1, min(max_workers, MAX_WORKERS_LIMIT))
+
+# Read per-request LIME settings (explanation mode, sample count, time budget, texts per prompt)
+def get_lime_options(data):
+    options = {"mode": "surrogate" if data.get('explanation_mode') == 'surrogate' else "llm"}
+    try:
+        if 'lime_samples' in data:
+            options["num_samples"] = max(10, min(int(data['lime_samples']), LIME_MAX_SAMPLES))
+        if 'lime_time_budget' in data:
+            options["time_budget"] = max(0.0, float(data['lime_time_budget']))
+        if 'lime_batch_size' in data:
+            options["batch_size"] = max(1, int(data['lime_batch_size']))
+    except (TypeError, ValueError):
+        pass
+    return options
+
+# Yes/no of the explicit "Recommendation: yes/no" line of a basic evaluation (a "Decision:" line counts too,
+# markdown emphasis allowed), or None; a yes or no elsewhere in the text is not a decision
+def basic_decision(response):
+    match = re.search(r'^\W*(?:recommendation|decision)\W*(yes|no)\b', response, re.IGNORECASE | re.MULTILINE)
+    return match.group(1).lower() if match else None
+
+# Feed a decision to the live fairness monitor, grouped by the candidate's gender
+# Failed LLM calls are left out: their error text is not a decision
+def record_decision(source, candidate, decision, response):
+    if decision in ('yes', 'no') and not isinstance(response, FailedResponse):
+        fairness_monitor.record(source, candidate.get('gender'), decision == 'yes')
+
+# Evaluate a single candidate with the basic prompt
+# A response from a batched prompt can be passed in to skip the LLM call
+def evaluate_basic(candidate, job_description, model, use_cache=True, on_token=None, response=None,
+                   prefix_reuse=False):
+    # Construct prompt
+    prompt = f"""
         Job Description:
         {job_description}
         
@@ -208,42 +211,30 @@ def basic_hiring():
         
         Evaluate if this candidate is suitable for the position based on the job description.
         Provide a yes/no recommendation and brief explanation.
+        Start your answer with a line of the form "Recommendation: yes" or "Recommendation: no".
         """
-        
-        response = get_ollama_response(prompt, model)
-        
-        # Highlight matching phrases
-        phrase_matches = highlight_matching_phrases(response, candidate)
-        
-        results.append({
-            "candidate": candidate,
-            "evaluation": response,
-            "phrase_matches": phrase_matches
-        })
-        
-    return jsonify({"results": results})
-
-# Advanced endpoint with self-prompting, LIME explanations, and phrase matching
-@app.route('/api/advanced_hiring', methods=['POST'])
-def advanced_hiring():
-    data = request.json
     
-    if not data or 'job_description' not in data:
-        return jsonify({"error": "Job description is required"}), 400
+    if response is None:
+        shared_prefix = prompt_prefix(prompt, candidate) if prefix_reuse else None
+        response = get_ollama_response(prompt, model, use_cache, on_token, shared_prefix)
+    record_decision('basic_hiring', candidate, basic_decision(response), response)
     
-    job_description = data['job_description']
-    model = data.get('model', DEFAULT_MODEL)
-    
-    # Load candidates
-    candidates = load_candidates()
-    if not candidates:
-        return jsonify({"error": "No candidates found in CSV file"}), 404
-    
-    results = []
+    # Highlight matching phrases
+    with metrics.stage("highlight"):
+        phrase_matches = highlight_matching_phrases(response, candidate)
     
-    for candidate in candidates:
-        # Self-prompting to mitigate bias
-        unbiased_prompt = f"""
+    return {
+        "candidate": candidate,
+        "evaluation": response,
+        "phrase_matches": phrase_matches
+    }
+
+# Evaluate a single candidate with self-prompting, LIME explanations, and phrase matching
+# A response from a batched prompt can be passed in to skip the LLM call
+def evaluate_advanced(candidate, job_description, model, use_cache=True, on_token=None, lime_options=None,
+                      response=None, prefix_reuse=False):
+    # Self-prompting to mitigate bias
+    unbiased_prompt = f"""
         I need to make an unbiased hiring decision. I will use a multi-step process:
         
         Step 1: Let me identify and set aside potential sources of bias in hiring such as:
@@ -277,126 +268,406 @@ def advanced_hiring():
         CONFIDENCE: [0-100]%
         EXPLANATION: [Your explanation here]
         """
+    
+    if response is None:
+        shared_prefix = prompt_prefix(unbiased_prompt, candidate) if prefix_reuse else None
+        response = get_ollama_response(unbiased_prompt, model, use_cache, on_token, shared_prefix)
+    
+    # Try to extract structured information from the response
+    try:
+        decision_match = re.search(r'DECISION:\s*(yes|no)', response, re.IGNORECASE)
+        confidence_match = re.search(r'CONFIDENCE:\s*(\d+)', response, re.IGNORECASE)
+        explanation_match = re.search(r'EXPLANATION:\s*(.*?)(?=$|\n\n)', response, re.IGNORECASE | re.DOTALL)
         
-        response = get_ollama_response(unbiased_prompt, model)
+        decision = decision_match.group(1).lower() if decision_match else "unknown"
+        if decision == "unknown":
+            metrics.parse_failure("decision")
+        record_decision('advanced_hiring', candidate, decision, response)
+        confidence = int(confidence_match.group(1)) if confidence_match else 0
+        explanation = explanation_match.group(1).strip() if explanation_match else response
         
-        # Try to extract structured information from the response
-        try:
-            decision_match = re.search(r'DECISION:\s*(yes|no)', response, re.IGNORECASE)
-            confidence_match = re.search(r'CONFIDENCE:\s*(\d+)', response, re.IGNORECASE)
-            explanation_match = re.search(r'EXPLANATION:\s*(.*?)(?=$|\n\n)', response, re.IGNORECASE | re.DOTALL)
-            
-            decision = decision_match.group(1).lower() if decision_match else "unknown"
-            confidence = int(confidence_match.group(1)) if confidence_match else 0
-            explanation = explanation_match.group(1).strip() if explanation_match else response
-            
-            # Apply phrase matching to explanation
+        # Apply phrase matching to explanation
+        with metrics.stage("highlight"):
             phrase_matches = highlight_matching_phrases(explanation, candidate)
-            
-            evaluation = {
-                "decision": decision,
-                "confidence": confidence,
-                "explanation": explanation,
-                "phrase_matches": phrase_matches
-            }
-            
-            # Calculate relevance metrics
-            matches_count = phrase_matches["match_count"]
-            total_words = len(explanation.split())
-            relevance_ratio = round(matches_count / max(total_words, 1) * 100, 2)
-            
-            # Add relevance metrics to the evaluation
-            evaluation["relevance_metrics"] = {
-                "matches_count": matches_count,
-                "total_words": total_words,
-                "relevance_ratio": relevance_ratio
-            }
-            
-        except Exception as e:
-            # If extraction fails, use the raw response
-            evaluation = {
-                "raw_response": response,
-                "error": str(e)
-            }
         
-        # Generate LIME explanation
-        lime_explainer = LimeTextExplainer(class_names=["Not Suitable", "Suitable"])
+        evaluation = {
+            "decision": decision,
+            "confidence": confidence,
+            "explanation": explanation,
+            "phrase_matches": phrase_matches
+        }
         
-        # Function for LIME to predict probabilities - this is a simplified approximation
-        def predict_proba(texts):
-            results = []
-            for text in texts:
-                # Create a more concise prompt for LIME that returns a more structured response
-                assessment_prompt = f"""
-                Job Description: {job_description[:200]}...
-                
-                Candidate Information: {text}
-                
-                Rate how suitable this candidate is for the job on a scale of 0 to 1, where 0 is completely unsuitable and 1 is perfectly suitable.
-                
-                Respond with ONLY a single number between 0 and 1. Do not include any explanation or additional text.
-                """
-                
-                response_text = get_ollama_response(assessment_prompt, model)
-                
-                # Try to extract a probability value
-                prob_match = re.search(r'0\.\d+', response_text)
-                if prob_match:
-                    prob = float(prob_match.group(0))
-                elif "1.0" in response_text or "1" == response_text.strip():
-                    prob = 1.0
-                elif "0.0" in response_text or "0" == response_text.strip():
-                    prob = 0.0
-                else:
-                    # Default to middle value if no clear probability
-                    prob = 0.5
-                    
-                results.append([1-prob, prob])  # [Not Suitable, Suitable]
-            
-            return np.array(results)
+        # Calculate relevance metrics
+        matches_count = phrase_matches["match_count"]
+        total_words = len(explanation.split())
+        relevance_ratio = round(matches_count / max(total_words, 1) * 100, 2)
         
-        # Create a concise candidate text for LIME analysis
-        relevant_info = []
-        if 'skills' in candidate:
-            relevant_info.append(f"Skills: {candidate['skills']}")
-        if 'experience' in candidate:
-            relevant_info.append(f"Experience: {candidate['experience']}")
-        if 'education' in candidate:
-            relevant_info.append(f"Education: {candidate['education']}")
-        if 'years_of_experience' in candidate:
-            relevant_info.append(f"Years of experience: {candidate['years_of_experience']}")
-            
-        candidate_text = ". ".join(relevant_info)
+        # Add relevance metrics to the evaluation
+        evaluation["relevance_metrics"] = {
+            "matches_count": matches_count,
+            "total_words": total_words,
+            "relevance_ratio": relevance_ratio
+        }
         
-        # Generate LIME explanation
-        try:
-            # Use fewer features and samples for efficiency
+    except Exception as e:
+        # If extraction fails, use the raw response
+        evaluation = {
+            "raw_response": response,
+            "error": str(e)
+        }
+    
+    # LIME classifier: dedupes perturbations and scores them in parallel within a time budget
+    lime_options = lime_options or {}
+    scorer = SuitabilityScorer(
+        job_description, model, use_cache,
+        batch_size=lime_options.get("batch_size", LIME_BATCH_SIZE),
+        time_budget=lime_options.get("time_budget", LIME_TIME_BUDGET)
+    )
+    
+    # Surrogate mode: fit a local TF-IDF model on LLM scores for a small seed sample of the perturbations
+    # and let LIME query that instead (it falls back to the LLM when too few are scored or the fit is poor)
+    if lime_options.get("mode") == "surrogate":
+        scorer = SurrogateScorer(scorer)
+    
+    # Create a concise candidate text for LIME analysis
+    relevant_info = []
+    if 'skills' in candidate:
+        relevant_info.append(f"Skills: {candidate['skills']}")
+    if 'experience' in candidate:
+        relevant_info.append(f"Experience: {candidate['experience']}")
+    if 'education' in candidate:
+        relevant_info.append(f"Education: {candidate['education']}")
+    if 'years_of_experience' in candidate:
+        relevant_info.append(f"Years of experience: {candidate['years_of_experience']}")
+        
+    candidate_text = ". ".join(relevant_info)
+    
+    # Perturbations are seeded from the candidate text, so repeat explanations ask the same (cached) prompts
+    lime_explainer = LimeTextExplainer(class_names=["Not Suitable", "Suitable"],
+                                       random_state=zlib.crc32(candidate_text.encode("utf-8")))
+    
+    # Generate LIME explanation
+    try:
+        with metrics.stage("lime"):
             exp = lime_explainer.explain_instance(
                 candidate_text,
-                predict_proba,
+                scorer,
                 num_features=4,
-                num_samples=10  # Reduced for speed
+                num_samples=lime_options.get("num_samples", LIME_NUM_SAMPLES)
             )
+        
+        # Extract features and their weights
+        lime_explanation = []
+        for feature, weight in exp.as_list():
+            lime_explanation.append({
+                "feature": feature,
+                "importance": round(weight, 3),
+                "supports_hiring": weight > 0
+            })
             
-            # Extract features and their weights
-            lime_explanation = []
-            for feature, weight in exp.as_list():
-                lime_explanation.append({
-                    "feature": feature,
-                    "importance": round(weight, 3),
-                    "supports_hiring": weight > 0
-                })
-                
-        except Exception as e:
-            lime_explanation = [{"error": str(e)}]
+    except Exception as e:
+        lime_explanation = [{"error": str(e)}]
+    
+    return {
+        "candidate": candidate,
+        "evaluation": evaluation,
+        "lime_explanation": lime_explanation,
+        "lime_stats": scorer.stats
+    }
+
+# Build the per-candidate evaluation function for a request body
+def make_evaluator(data, mode):
+    job_description = data['job_description']
+    model = data.get('model', DEFAULT_MODEL)
+    use_cache = bool(data.get('use_cache', True))
+    prefix_reuse = bool(data.get('prefix_reuse', PREFIX_REUSE))
+    
+    if mode == 'basic':
+        return partial(evaluate_basic, job_description=job_description, model=model, use_cache=use_cache,
+                       prefix_reuse=prefix_reuse)
+    return partial(evaluate_advanced, job_description=job_description, model=model, use_cache=use_cache,
+                   lime_options=get_lime_options(data), prefix_reuse=prefix_reuse)
+
+# Prompt asking for a structured evaluation of several candidates at once
+def build_batch_prompt(job_description, items, mode):
+    candidates = "\n\n".join(f"Candidate {item_id}:\n{text}" for item_id, text in items)
+    if mode == 'basic':
+        fields = '{"decision": "yes", "explanation": "..."}'
+        instructions = "Evaluate if each candidate is suitable for the position based on the job description."
+    else:
+        fields = '{"decision": "yes", "confidence": 80, "explanation": "..."}'
+        instructions = (
+            "Make an unbiased hiring decision for each candidate. Set aside potential sources of bias "
+            "such as age, gender, names, and cultural or ethnic background, and focus exclusively on "
+            "job-specific skills, relevant education and certifications, work experience and achievements. "
+            "The explanation must reference specific qualifications that match or don't match the job requirements."
+        )
+    return (
+        f"Job Description:\n{job_description}\n\n"
+        f"{instructions}\n\n{candidates}\n\n"
+        f"Respond with ONLY a JSON object keyed by candidate id, where each value looks like {fields}. "
+        f"Use \"yes\" or \"no\" for decision and a number from 0 to 100 for confidence."
+    )
+
+# Normalise one candidate's entry from a batched response into the single-prompt text format
+def batch_entry_to_response(entry, mode):
+    if not isinstance(entry, dict):
+        return None
+    decision = str(entry.get('decision', '')).strip().lower()
+    explanation = str(entry.get('explanation', '')).strip()
+    if decision not in ('yes', 'no') or not explanation:
+        return None
+    if mode == 'basic':
+        return f"Recommendation: {decision.capitalize()}\n{explanation}"
+    try:
+        confidence = int(float(str(entry.get('confidence')).rstrip('%')))
+    except ValueError:
+        return None
+    if not 0 <= confidence <= 100:
+        return None
+    return f"DECISION: {decision}\nCONFIDENCE: {confidence}%\nEXPLANATION: {explanation}"
+
+# Evaluate candidates with several per prompt; entries that fail validation use the single prompt
+def evaluate_batched(candidates, data, mode):
+    job_description = data['job_description']
+    texts = [json.dumps(candidate, indent=2) for candidate in candidates]
+    
+    responses, stats = run_batched(
+        texts, data.get('model', DEFAULT_MODEL),
+        lambda items: build_batch_prompt(job_description, items, mode),
+        lambda entry: batch_entry_to_response(entry, mode),
+        lambda text: build_batch_prompt(job_description, [("C1", text)], mode),
+        get_prompt_batch_size(data),
+        use_cache=bool(data.get('use_cache', True)),
+        max_workers=get_max_workers(data)
+    )
+    
+    evaluate = make_evaluator(data, mode)
+    responses = {id(candidate): response for candidate, response in zip(candidates, responses)}
+    results = evaluate_candidates(
+        candidates,
+        lambda candidate: evaluate(candidate, response=responses[id(candidate)]),
+        max_workers=get_max_workers(data)
+    )
+    return results, stats
+
+# Read the number of candidates per prompt (1 disables batching)
+def get_prompt_batch_size(data):
+    try:
+        return max(1, min(int(data.get('prompt_batch_size', 1)), MAX_PROMPT_BATCH_SIZE))
+    except (TypeError, ValueError):
+        return 1
+
+# Basic endpoint that just forwards to Ollama
+@app.route('/api/basic_hiring', methods=['POST'])
+def basic_hiring():
+    data = request.json
+    
+    if not data or 'job_description' not in data:
+        return jsonify({"error": "Job description is required"}), 400
+    
+    with track('basic_hiring') as timings:
+        # Load candidates
+        if not load_candidates():
+            return jsonify({"error": "No candidates found in CSV file"}), 404
+        candidates, pagination = select_candidates(data)
+        
+        if get_prompt_batch_size(data) > 1:
+            results, batching = evaluate_batched(candidates, data, 'basic')
+            return timed_response({"results": results, "pagination": pagination, "batching": batching}, data, timings)
+        
+        results = evaluate_candidates(candidates, make_evaluator(data, 'basic'), max_workers=get_max_workers(data))
         
-        results.append({
-            "candidate": candidate,
-            "evaluation": evaluation,
-            "lime_explanation": lime_explanation
-        })
+        return timed_response({"results": results, "pagination": pagination}, data, timings)
+
+# Advanced endpoint with self-prompting, LIME explanations, and phrase matching
+@app.route('/api/advanced_hiring', methods=['POST'])
+def advanced_hiring():
+    data = request.json
+    
+    if not data or 'job_description' not in data:
+        return jsonify({"error": "Job description is required"}), 400
+    
+    with track('advanced_hiring') as timings:
+        # Load candidates
+        if not load_candidates():
+            return jsonify({"error": "No candidates found in CSV file"}), 404
+        candidates, pagination = select_candidates(data)
+        
+        if get_prompt_batch_size(data) > 1:
+            results, batching = evaluate_batched(candidates, data, 'advanced')
+            return timed_response({"results": results, "pagination": pagination, "batching": batching}, data, timings)
         
-    return jsonify({"results": results})
+        results = evaluate_candidates(candidates, make_evaluator(data, 'advanced'), max_workers=get_max_workers(data))
+        
+        return timed_response({"results": results, "pagination": pagination}, data, timings)
+
+# Streaming endpoint: emits each candidate's evaluation as soon as it is ready
+@app.route('/api/hiring/stream', methods=['POST'])
+def hiring_stream():
+    """
+    Streams evaluations as newline-delimited JSON (or Server-Sent Events when the
+    client sends Accept: text/event-stream). Events are
+    {"type": "start", "total": n}, then one {"type": "result", "index": i, "result": ...}
+    per candidate in completion order, optionally interleaved with
+    {"type": "token", "index": i, "text": ...} fragments of the model output
+    when stream_tokens is set, and finally {"type": "done", "total": n}.
+    """
+    data = request.json
+    
+    if not data or 'job_description' not in data:
+        return jsonify({"error": "Job description is required"}), 400
+    
+    stream_tokens = bool(data.get('stream_tokens', False))
+    evaluate = make_evaluator(data, data.get('mode', 'advanced'))
+    max_workers = get_max_workers(data)
+    sse = 'text/event-stream' in request.headers.get('Accept', '')
+    
+    # Load candidates
+    if not load_candidates():
+        return jsonify({"error": "No candidates found in CSV file"}), 404
+    candidates, pagination = select_candidates(data)
+    
+    events = queue.Queue()
+    
+    def run(index, candidate):
+        on_token = None
+        if stream_tokens:
+            on_token = lambda text: events.put({"type": "token", "index": index, "text": text})
+        try:
+            result = evaluate(candidate, on_token=on_token)
+        except Exception as e:
+            result = {"candidate": candidate, "error": str(e)}
+        events.put({"type": "result", "index": index, "result": result})
+    
+    def encode(event):
+        if sse:
+            return f"event: {event['type']}\ndata: {json.dumps(event)}\n\n"
+        return json.dumps(event) + "\n"
+    
+    def generate():
+        with track('hiring_stream') as timings:
+            pool = ThreadPoolExecutor(max_workers=max_workers)
+            try:
+                for index, candidate in enumerate(candidates):
+                    pool.submit(metrics.propagate(run), index, candidate)
+                yield encode({"type": "start", "total": len(candidates), "pagination": pagination})
+                
+                remaining = len(candidates)
+                while remaining:
+                    event = events.get()
+                    if event["type"] == "result":
+                        remaining -= 1
+                    yield encode(event)
+                
+                done = {"type": "done", "total": len(candidates)}
+                if data.get('debug'):
+                    done["debug"] = timings.summary()
+                yield encode(done)
+            finally:
+                # Drop queued work if the client went away mid-stream
+                pool.shutdown(wait=False, cancel_futures=True)
+    
+    mimetype = 'text/event-stream' if sse else 'application/x-ndjson'
+    return Response(stream_with_context(generate()), mimetype=mimetype,
+                    headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+# Background job body: evaluates the job's candidates and records each result as it finishes
+def run_hiring_job(job, record):
+    params = job.params
+    evaluate = make_evaluator(params, params['mode'])
+    
+    with track('jobs'):
+        max_workers = get_max_workers(params)
+        pool = ThreadPoolExecutor(max_workers=max_workers)
+        try:
+            queued = enumerate(params['candidates'])
+            running = {}
+            # A candidate is only submitted when a worker is free and the job is not cancelled, so a cancel
+            # stops new LLM calls at the next candidate; wake up periodically so it is noticed between results
+            while not job.cancelled():
+                while len(running) < max_workers and not job.cancelled():
+                    item = next(queued, None)
+                    if item is None:
+                        break
+                    index, candidate = item
+                    running[pool.submit(metrics.propagate(evaluate), candidate)] = index
+                if not running:
+                    break
+                done, _ = wait(running, timeout=0.5, return_when=FIRST_COMPLETED)
+                for future in done:
+                    index = running.pop(future)
+                    try:
+                        result = future.result()
+                    except Exception as e:
+                        result = {"candidate": params['candidates'][index], "error": str(e)}
+                    record(index, result)
+        finally:
+            pool.shutdown(wait=False, cancel_futures=True)
+
+job_manager = JobManager(run_hiring_job)
+
+# Submit a long-running hiring analysis; poll GET /api/jobs/<id> for progress
+@app.route('/api/jobs', methods=['POST'])
+def submit_job():
+    data = request.json
+    
+    if not data or 'job_description' not in data:
+        return jsonify({"error": "Job description is required"}), 400
+    
+    # Load candidates
+    if not load_candidates():
+        return jsonify({"error": "No candidates found in CSV file"}), 404
+    candidates, pagination = select_candidates(data)
+    
+    params = {key: data[key] for key in JOB_PARAMS if key in data}
+    params['mode'] = 'basic' if data.get('mode') == 'basic' else 'advanced'
+    params['candidates'] = candidates
+    
+    job = job_manager.submit(params, len(candidates))
+    return jsonify({"job_id": job.id, "status": job.status, "pagination": pagination}), 202, {"Location": f"/api/jobs/{job.id}"}
+
+# Job status with the results finished so far (null for candidates still pending)
+@app.route('/api/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    job = job_manager.get(job_id)
+    if job is None:
+        return jsonify({"error": "Job not found"}), 404
+    return jsonify(job)
+
+# Cancel a queued or running job; results finished so far are kept
+@app.route('/api/jobs/<job_id>', methods=['DELETE'])
+def cancel_job(job_id):
+    job = job_manager.cancel(job_id)
+    if job is None:
+        return jsonify({"error": "Job not found"}), 404
+    return jsonify(job)
+
+# LLM response cache statistics
+@app.route('/api/cache', methods=['GET'])
+def cache_stats():
+    cache = get_cache()
+    if cache is None:
+        return jsonify({"enabled": False})
+    return jsonify({"enabled": True, **cache.stats()})
+
+# Live fairness of the decisions made since start-up, or over the last N decisions / T minutes
+@app.route('/api/fairness', methods=['GET'])
+def fairness_snapshot():
+    source = request.args.get('source')
+    try:
+        last = int(request.args['last']) if 'last' in request.args else None
+        minutes = float(request.args['minutes']) if 'minutes' in request.args else None
+    except ValueError:
+        last = minutes = -1
+    if (last is not None and last < 1) or (minutes is not None and not minutes > 0):
+        return jsonify({"error": "last must be a positive integer and minutes a positive number"}), 400
+    return jsonify({**fairness_monitor.snapshot(source, last, minutes), "sources": fairness_monitor.MONITOR.sources()})
+
+# Prometheus scrape endpoint
+@app.route('/metrics', methods=['GET'])
+def prometheus_metrics():
+    return Response(metrics.render(), content_type=metrics.CONTENT_TYPE)
 
 if __name__ == '__main__':
     app.run(debug=True, host='0.0.0.0', port=8000)
\ No newline at end of file
@@ -0,0 +1,173 @@
+import bisect
+import csv
+import hashlib
+import io
+import os
+import re
+import threading
+
+# Default page size when a request paginates without giving one
+DEFAULT_PAGE_SIZE = 20
+
+
+# Split a skills-style field into normalised keywords
+def split_keywords(value):
+    return {kw.strip().lower() for kw in re.split(r'[,;]', value or "") if kw.strip()}
+
+
+# Split free text into lowercase word tokens
+def split_words(value):
+    return set(re.findall(r'\w+', (value or "").lower()))
+
+
+# Parse years of experience, treating blanks and junk as unknown
+def parse_years(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+class CandidateIndex:
+    """Immutable snapshot of the candidate file with lookup indexes."""
+
+    def __init__(self, candidates, digest):
+        self.candidates = candidates
+        self.digest = digest
+        self.skills = {}
+        self.education = {}
+        years = []
+
+        for i, candidate in enumerate(candidates):
+            for skill in split_keywords(candidate.get('skills')):
+                self.skills.setdefault(skill, set()).add(i)
+            for word in split_words(candidate.get('education')):
+                self.education.setdefault(word, set()).add(i)
+            value = parse_years(candidate.get('years_of_experience'))
+            if value is not None:
+                years.append((value, i))
+
+        years.sort()
+        self.years = [value for value, _ in years]
+        self.years_ids = [i for _, i in years]
+
+    def years_between(self, low=None, high=None):
+        start = 0 if low is None else bisect.bisect_left(self.years, low)
+        end = len(self.years) if high is None else bisect.bisect_right(self.years, high)
+        return set(self.years_ids[start:end])
+
+    def match(self, filters):
+        """Row ids matching every filter, in file order."""
+        ids = None
+
+        def narrow(found):
+            return found if ids is None else ids & found
+
+        for skill in filters.get('skills') or []:
+            ids = narrow(self.skills.get(skill.strip().lower(), set()))
+        for word in split_words(filters.get('education')):
+            ids = narrow(self.education.get(word, set()))
+        if filters.get('min_years') is not None or filters.get('max_years') is not None:
+            ids = narrow(self.years_between(filters.get('min_years'), filters.get('max_years')))
+
+        rows = range(len(self.candidates)) if ids is None else sorted(ids)
+
+        # Any other field is an exact, case-insensitive match
+        for field, value in (filters.get('fields') or {}).items():
+            value = str(value).strip().lower()
+            rows = [i for i in rows if str(self.candidates[i].get(field, "")).strip().lower() == value]
+        return list(rows)
+
+
+class CandidateStore:
+    """
+    Loads the candidate CSV once and serves filtered, paginated slices.
+    The file is re-read only when its mtime or size changes, and the
+    indexes are rebuilt only when the content hash actually differs.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._index = CandidateIndex([], None)
+        self._stat = None
+        self._lock = threading.Lock()
+
+    def snapshot(self):
+        """Current CandidateIndex, reloading the file first if it changed."""
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            self._index, self._stat = CandidateIndex([], None), None
+            return self._index
+
+        signature = (stat.st_mtime_ns, stat.st_size)
+        if signature == self._stat:
+            return self._index
+
+        with self._lock:
+            if signature != self._stat:
+                with open(self.path, 'rb') as file:
+                    raw = file.read()
+                digest = hashlib.sha256(raw).hexdigest()
+                if digest != self._index.digest:
+                    reader = csv.DictReader(io.StringIO(raw.decode('utf-8'), newline=''))
+                    self._index = CandidateIndex(list(reader), digest)
+                self._stat = signature
+        return self._index
+
+    def all(self):
+        return self.snapshot().candidates
+
+    def query(self, filters=None, offset=0, limit=None):
+        """
+        Returns (candidates, total) where candidates is the requested page of
+        rows matching filters and total is the number of matches overall.
+        """
+        index = self.snapshot()
+        rows = index.match(filters or {})
+        end = None if limit is None else offset + limit
+        return [index.candidates[i] for i in rows[offset:end]], len(rows)
+
+
+# Read filters and pagination from a request body
+def parse_query(data):
+    """
+    Accepts {"filters": {"skills": "Python, SQL" | [...], "education": "...",
+    "min_years": n, "max_years": n, <any other field>: value},
+    "offset"/"limit" or "page"/"page_size"}.
+    Returns (filters, offset, limit) with limit None meaning no pagination.
+    """
+    raw = dict(data.get('filters') or {})
+    filters = {}
+
+    skills = raw.pop('skills', None)
+    if isinstance(skills, str):
+        skills = [skill for skill in re.split(r'[,;]', skills) if skill.strip()]
+    if skills:
+        filters['skills'] = skills
+
+    education = raw.pop('education', None)
+    if education:
+        filters['education'] = education
+
+    for key in ('min_years', 'max_years'):
+        value = parse_years(raw.pop(key, None))
+        if value is not None:
+            filters[key] = value
+
+    if raw:
+        filters['fields'] = raw
+
+    offset, limit = 0, None
+    try:
+        if 'page' in data or 'page_size' in data:
+            limit = max(1, int(data.get('page_size', DEFAULT_PAGE_SIZE)))
+            offset = max(0, int(data.get('page', 1)) - 1) * limit
+        else:
+            offset = max(0, int(data.get('offset', 0)))
+            if data.get('limit') is not None:
+                limit = max(1, int(data['limit']))
+    except (TypeError, ValueError):
+        offset, limit = 0, None
+
+    return filters, offset, limit
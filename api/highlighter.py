@@ -0,0 +1,188 @@
+import html
+import re
+from collections import deque
+from functools import lru_cache
+
+# Key fields to check for matches
+KEY_FIELDS = ['skills', 'experience', 'education', 'years_of_experience',
+              'job_title', 'certifications', 'achievements', 'languages',
+              'tools', 'projects', 'name', 'location']
+
+# Very short or common words that are never highlighted
+STOP_WORDS = {'and', 'the', 'has', 'with', 'for', 'are', 'not'}
+
+HTML_OPEN = '<span style="background-color: #FFFF99;" title="{title}">'
+HTML_CLOSE = '</span>'
+MARKDOWN_MARK = '**'
+
+
+class PhraseMatcher:
+    """
+    Aho-Corasick automaton over a fixed set of patterns. find() reports every
+    occurrence of every pattern in a single left-to-right pass over the text.
+    """
+
+    def __init__(self, patterns):
+        self.patterns = patterns
+        self.goto = [{}]
+        self.fail = [0]
+        self.output = [[]]
+
+        for pattern_id, pattern in enumerate(patterns):
+            state = 0
+            for char in pattern:
+                if char not in self.goto[state]:
+                    self.goto.append({})
+                    self.fail.append(0)
+                    self.output.append([])
+                    self.goto[state][char] = len(self.goto) - 1
+                state = self.goto[state][char]
+            self.output[state].append(pattern_id)
+
+        # Breadth-first pass to wire failure links and inherit their outputs
+        queue = deque(self.goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, child in self.goto[state].items():
+                queue.append(child)
+                fallback = self.fail[state]
+                while fallback and char not in self.goto[fallback]:
+                    fallback = self.fail[fallback]
+                self.fail[child] = self.goto[fallback].get(char, 0) if state else 0
+                self.output[child] = self.output[child] + self.output[self.fail[child]]
+
+    def find(self, text):
+        """Yields (start, end, pattern_id) for each occurrence, ordered by end position."""
+        state = 0
+        for position, char in enumerate(text):
+            while state and char not in self.goto[state]:
+                state = self.fail[state]
+            state = self.goto[state].get(char, 0)
+            for pattern_id in self.output[state]:
+                end = position + 1
+                yield end - len(self.patterns[pattern_id]), end, pattern_id
+
+
+@lru_cache(maxsize=1024)
+def compile_candidate(values):
+    """
+    Builds the matcher for one candidate from its (field, value) pairs.
+    Returns (entries, matcher, entries_by_pattern) where entries are
+    (field, keyword) labels in the order the matches are reported.
+    """
+    entries = []
+    patterns = []
+    all_candidate_attributes = []
+
+    for field, attr_value in values:
+        all_candidate_attributes.append(attr_value)
+
+        # First try comma/semicolon separated lists, else use the whole field
+        keywords = [kw.strip() for kw in re.split(r'[,;]', attr_value) if len(kw.strip()) > 2]
+        if not keywords:
+            keywords = [attr_value]
+
+        for keyword in keywords:
+            keyword_lower = keyword.lower()
+            if len(keyword_lower) <= 2 or keyword_lower in STOP_WORDS:
+                continue
+            entries.append((field, keyword))
+            patterns.append(keyword_lower)
+
+    # Longer phrases (3+ whitespace-separated words) from the combined candidate text
+    combined_text = " ".join(all_candidate_attributes).lower()
+    for run in re.finditer(r'\w+(?:\s+\w+)*', combined_text):
+        phrase = run.group(0)
+        if len(phrase) > 10 and len(phrase.split()) >= 3:
+            entries.append(("multi_field_phrase", phrase))
+            patterns.append(phrase)
+
+    unique_patterns = list(dict.fromkeys(patterns))
+    pattern_ids = {pattern: i for i, pattern in enumerate(unique_patterns)}
+    entries_by_pattern = [[] for _ in unique_patterns]
+    for entry_index, pattern in enumerate(patterns):
+        entries_by_pattern[pattern_ids[pattern]].append(entry_index)
+
+    return entries, PhraseMatcher(unique_patterns), entries_by_pattern
+
+
+def merge_spans(matches):
+    """Collapses overlapping matches (sorted by start) into (start, end, titles) spans."""
+    spans = []
+    for match in matches:
+        title = f'{match["field"]}: {match["keyword"]}'
+        if spans and match["start_pos"] < spans[-1][1]:
+            last = spans[-1]
+            last[1] = max(last[1], match["end_pos"])
+            if title not in last[2]:
+                last[2].append(title)
+        else:
+            spans.append([match["start_pos"], match["end_pos"], [title]])
+    return spans
+
+
+def render(text, spans, open_tag, close_tag):
+    """Wraps each span of text in tags in one linear pass."""
+    parts = []
+    position = 0
+    for start, end, titles in spans:
+        parts.append(text[position:start])
+        parts.append(open_tag(titles))
+        parts.append(text[start:end])
+        parts.append(close_tag)
+        position = end
+    parts.append(text[position:])
+    return "".join(parts)
+
+
+# Function to identify and highlight matching phrases between explanation and candidate data
+def highlight_matching_phrases(explanation, candidate):
+    """
+    Identifies and highlights words/phrases in the explanation that match the candidate description.
+    Returns both the highlighted explanation and detailed match information.
+    Overlapping matches are merged into a single highlighted span.
+    """
+    values = tuple((field, str(candidate[field])) for field in KEY_FIELDS
+                   if field in candidate and candidate[field])
+    entries, matcher, entries_by_pattern = compile_candidate(values)
+
+    # Create a lowercase version of the explanation for matching
+    explanation_lower = explanation.lower()
+
+    # Keep the leftmost non-overlapping occurrences of each pattern, like re.finditer
+    found = []
+    last_end = {}
+    for start, end, pattern_id in matcher.find(explanation_lower):
+        if start < last_end.get(pattern_id, 0):
+            continue
+        last_end[pattern_id] = end
+        for entry_index in entries_by_pattern[pattern_id]:
+            found.append((start, entry_index, end))
+
+    # Sort matches by start position, then by field order
+    found.sort()
+    all_matches = []
+    for start, entry_index, end in found:
+        field, keyword = entries[entry_index]
+        all_matches.append({
+            "field": field,
+            "keyword": keyword,
+            "start_pos": start,
+            "end_pos": end
+        })
+
+    spans = merge_spans(all_matches)
+    highlighted_explanation = render(
+        explanation, spans,
+        lambda titles: HTML_OPEN.format(title=html.escape("; ".join(titles), quote=True)),
+        HTML_CLOSE
+    )
+    marked_explanation = render(explanation, spans, lambda titles: MARKDOWN_MARK, MARKDOWN_MARK)
+
+    return {
+        "original_explanation": explanation,
+        "highlighted_explanation_html": highlighted_explanation,
+        "highlighted_explanation_markdown": marked_explanation,
+        "matches": all_matches,
+        "match_count": len(all_matches)
+    }
@@ -0,0 +1,352 @@
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+# Configuration (overridable through the environment)
+JOBS_DB_PATH = os.environ.get(
+    "JOBS_DB_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", ".cache", "jobs.sqlite"),
+)
+JOB_WORKERS = int(os.environ.get("JOB_WORKERS", "2"))  # jobs running at the same time
+JOB_TTL = float(os.environ.get("JOB_TTL", "3600"))  # seconds a finished job is kept
+JOB_PURGE_INTERVAL = float(os.environ.get("JOB_PURGE_INTERVAL", "60"))  # seconds between sweeps for expired jobs
+
+FINISHED_STATUSES = ("completed", "failed", "cancelled", "interrupted")
+
+# Seconds between checks of the store for a cancel requested through another process
+CANCEL_POLL_INTERVAL = 1.0
+
+
+def pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass  # alive, just owned by another user
+    return True
+
+
+class JobStore:
+    """
+    SQLite persistence for jobs and their per-candidate results.
+    Results are stored one row per candidate so partial progress survives
+    a restart and is cheap to write as each candidate finishes. Each job
+    records the process that runs it ("host:pid:boot id"), since several
+    processes (server workers, the debug reloader) can share one database.
+    """
+
+    def __init__(self, path=JOBS_DB_PATH):
+        self.path = os.path.abspath(path)
+        self._local = threading.local()
+
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        conn = self._conn()
+        conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS jobs (
+                id TEXT PRIMARY KEY,
+                status TEXT NOT NULL,
+                params TEXT NOT NULL,
+                total INTEGER NOT NULL,
+                completed INTEGER NOT NULL DEFAULT 0,
+                error TEXT,
+                created_at REAL NOT NULL,
+                started_at REAL,
+                finished_at REAL,
+                owner TEXT,
+                cancel_requested INTEGER NOT NULL DEFAULT 0
+            );
+            CREATE TABLE IF NOT EXISTS job_results (
+                job_id TEXT NOT NULL,
+                idx INTEGER NOT NULL,
+                result TEXT NOT NULL,
+                PRIMARY KEY (job_id, idx)
+            );
+            """
+        )
+        # Databases created before owners were recorded lack the newer columns
+        columns = {row[1] for row in conn.execute("PRAGMA table_info(jobs)")}
+        if "owner" not in columns:
+            conn.execute("ALTER TABLE jobs ADD COLUMN owner TEXT")
+        if "cancel_requested" not in columns:
+            conn.execute("ALTER TABLE jobs ADD COLUMN cancel_requested INTEGER NOT NULL DEFAULT 0")
+        conn.commit()
+
+    def _conn(self):
+        # sqlite3 connections cannot be shared across threads, so keep one per thread
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def create(self, job, owner=None):
+        conn = self._conn()
+        conn.execute(
+            "INSERT INTO jobs (id, status, params, total, created_at, owner) VALUES (?, ?, ?, ?, ?, ?)",
+            (job.id, job.status, json.dumps(job.params), job.total, job.created_at, owner),
+        )
+        conn.commit()
+
+    def update(self, job):
+        conn = self._conn()
+        conn.execute(
+            "UPDATE jobs SET status = ?, completed = ?, error = ?, started_at = ?, finished_at = ? WHERE id = ?",
+            (job.status, job.completed, job.error, job.started_at, job.finished_at, job.id),
+        )
+        conn.commit()
+
+    def add_result(self, job_id, index, result):
+        conn = self._conn()
+        conn.execute(
+            "INSERT OR REPLACE INTO job_results (job_id, idx, result) VALUES (?, ?, ?)",
+            (job_id, index, json.dumps(result)),
+        )
+        conn.execute("UPDATE jobs SET completed = completed + 1 WHERE id = ?", (job_id,))
+        conn.commit()
+
+    def load(self, job_id):
+        """Return a stored job as a dict (with ordered results), or None."""
+        conn = self._conn()
+        row = conn.execute(
+            "SELECT id, status, total, completed, error, created_at, started_at, finished_at "
+            "FROM jobs WHERE id = ?", (job_id,)
+        ).fetchone()
+        if row is None:
+            return None
+
+        job = dict(zip(("id", "status", "total", "completed", "error",
+                        "created_at", "started_at", "finished_at"), row))
+        results = [None] * job["total"]
+        for index, result in conn.execute("SELECT idx, result FROM job_results WHERE job_id = ?", (job_id,)):
+            results[index] = json.loads(result)
+        job["results"] = results
+        return job
+
+    def request_cancel(self, job_id):
+        """Ask the process running a job to cancel it; returns whether the job was still unfinished."""
+        conn = self._conn()
+        updated = conn.execute(
+            "UPDATE jobs SET cancel_requested = 1 WHERE id = ? AND status IN ('queued', 'running')", (job_id,)
+        ).rowcount
+        conn.commit()
+        return updated > 0
+
+    def cancel_requested(self, job_id):
+        row = self._conn().execute("SELECT cancel_requested FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return bool(row and row[0])
+
+    def mark_interrupted(self, owner):
+        """
+        Flag jobs left queued or running by a process that is gone: one on
+        this host whose pid no longer runs (or is now this process under
+        another boot id), or one recorded before owners were. Jobs of live
+        processes, and of other hosts, are left alone.
+        """
+        host, pid, _ = owner.rsplit(":", 2)
+        conn = self._conn()
+        stale = []
+        for job_id, job_owner in conn.execute(
+                "SELECT id, owner FROM jobs WHERE status IN ('queued', 'running')").fetchall():
+            if job_owner is None:
+                stale.append(job_id)
+                continue
+            job_host, job_pid, _ = job_owner.rsplit(":", 2)
+            if job_host == host and job_owner != owner and (job_pid == pid or not pid_alive(int(job_pid))):
+                stale.append(job_id)
+        conn.executemany(
+            "UPDATE jobs SET status = 'interrupted', error = 'Server restarted before the job finished', "
+            "finished_at = ? WHERE id = ? AND status IN ('queued', 'running')",
+            [(time.time(), job_id) for job_id in stale],
+        )
+        conn.commit()
+        return len(stale)
+
+    def purge(self, finished_before):
+        """Delete finished jobs (and their results) older than the cutoff."""
+        conn = self._conn()
+        conn.execute(
+            "DELETE FROM job_results WHERE job_id IN "
+            "(SELECT id FROM jobs WHERE finished_at IS NOT NULL AND finished_at < ?)",
+            (finished_before,),
+        )
+        removed = conn.execute(
+            "DELETE FROM jobs WHERE finished_at IS NOT NULL AND finished_at < ?", (finished_before,)
+        ).rowcount
+        conn.commit()
+        return removed
+
+
+class Job:
+    """A submitted analysis: its parameters, progress and partial results."""
+
+    def __init__(self, params, total):
+        self.id = uuid.uuid4().hex
+        self.params = params
+        self.total = total
+        self.status = "queued"
+        self.results = [None] * total
+        self.completed = 0
+        self.error = None
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self._cancel = threading.Event()
+        self._lock = threading.Lock()
+        self._poll_cancel = None  # set by the JobManager to see cancels made through other processes
+        self._polled_at = 0.0
+
+    def cancelled(self):
+        if not self._cancel.is_set() and self._poll_cancel is not None:
+            now = time.monotonic()
+            if now - self._polled_at >= CANCEL_POLL_INTERVAL:
+                self._polled_at = now
+                if self._poll_cancel():
+                    self._cancel.set()
+        return self._cancel.is_set()
+
+    def to_dict(self):
+        with self._lock:
+            return {
+                "id": self.id,
+                "status": self.status,
+                "total": self.total,
+                "completed": self.completed,
+                "error": self.error,
+                "created_at": self.created_at,
+                "started_at": self.started_at,
+                "finished_at": self.finished_at,
+                "results": list(self.results),
+            }
+
+
+class JobManager:
+    """
+    Runs jobs on an in-process worker pool and tracks them in a JobStore.
+    run(job, record) does the work; it calls record(index, result) as each
+    candidate finishes and should stop early once job.cancelled() is true.
+    Finished jobs older than ttl are purged by a background thread every
+    purge_interval seconds, so they expire on an idle server too, and
+    before a lookup when a sweep is due.
+    """
+
+    def __init__(self, run, store=None, workers=JOB_WORKERS, ttl=JOB_TTL, purge_interval=JOB_PURGE_INTERVAL):
+        self.run = run
+        self.store = store or JobStore()
+        self.ttl = ttl
+        self.purge_interval = purge_interval
+        self.jobs = {}
+        self._lock = threading.Lock()
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="job")
+        self._last_purge = 0.0
+        self._closed = threading.Event()
+        # Identifies this process's jobs in a database other processes may be using at the same time
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self.store.mark_interrupted(self.owner)
+        if purge_interval > 0:
+            threading.Thread(target=self._purge_periodically, name="job-purge", daemon=True).start()
+
+    def submit(self, params, total):
+        self.purge()
+        job = Job(params, total)
+        job._poll_cancel = lambda: self.store.cancel_requested(job.id)
+        self.store.create(job, self.owner)
+        with self._lock:
+            self.jobs[job.id] = job
+        self._pool.submit(self._execute, job)
+        return job
+
+    def get(self, job_id):
+        """Current state of a job from memory, falling back to the store."""
+        self.purge_if_due()
+        with self._lock:
+            job = self.jobs.get(job_id)
+        if job is not None:
+            return job.to_dict()
+        return self.store.load(job_id)
+
+    def cancel(self, job_id):
+        """
+        Request cancellation; returns the job state or None if unknown. A job
+        run by another process is flagged in the store and stops once that
+        process next checks job.cancelled().
+        """
+        with self._lock:
+            job = self.jobs.get(job_id)
+        if job is None:
+            self.store.request_cancel(job_id)
+            return self.store.load(job_id)
+
+        job._cancel.set()
+        with job._lock:
+            if job.status == "queued":
+                job.status = "cancelled"
+                job.finished_at = time.time()
+        self.store.update(job)
+        return job.to_dict()
+
+    def purge(self):
+        """Forget finished jobs older than the retention period."""
+        self._last_purge = time.monotonic()
+        cutoff = time.time() - self.ttl
+        with self._lock:
+            for job_id, job in list(self.jobs.items()):
+                if job.finished_at is not None and job.finished_at < cutoff:
+                    del self.jobs[job_id]
+        self.store.purge(cutoff)
+
+    def purge_if_due(self):
+        if time.monotonic() - self._last_purge >= self.purge_interval:
+            self.purge()
+
+    def _purge_periodically(self):
+        while not self._closed.wait(self.purge_interval):
+            try:
+                self.purge()
+            except sqlite3.Error:
+                pass  # the store is busy or gone; the next sweep tries again
+
+    def close(self):
+        """Stop the purge thread and wait for running jobs."""
+        self._closed.set()
+        self._pool.shutdown(wait=True)
+
+    def _record(self, job, index, result):
+        with job._lock:
+            job.results[index] = result
+            job.completed += 1
+        self.store.add_result(job.id, index, result)
+
+    def _execute(self, job):
+        with job._lock:
+            if job.status != "queued":
+                return
+        if job.cancelled():
+            with job._lock:
+                job.status = "cancelled"
+                job.finished_at = time.time()
+            self.store.update(job)
+            return
+        with job._lock:
+            job.status = "running"
+            job.started_at = time.time()
+        self.store.update(job)
+
+        try:
+            self.run(job, lambda index, result: self._record(job, index, result))
+            status, error = ("cancelled" if job.cancelled() else "completed"), None
+        except Exception as e:
+            status, error = "failed", str(e)
+
+        with job._lock:
+            job.status = status
+            job.error = error
+            job.finished_at = time.time()
+        self.store.update(job)
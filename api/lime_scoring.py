@@ -0,0 +1,298 @@
+import os
+import re
+import sys
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+import numpy as np
+from sklearn.feature_extraction.text import TfidfVectorizer
+from sklearn.linear_model import Ridge
+from sklearn.model_selection import KFold, cross_val_predict
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from common import metrics
+from common.llm_cache import make_key
+from common.ollama_client import get_client, OllamaError
+
+# Configuration (overridable through the environment)
+LIME_NUM_SAMPLES = int(os.environ.get("LIME_NUM_SAMPLES", "50"))
+LIME_MAX_SAMPLES = int(os.environ.get("LIME_MAX_SAMPLES", "500"))
+LIME_TIME_BUDGET = float(os.environ.get("LIME_TIME_BUDGET", "20"))  # seconds per candidate
+LIME_WORKERS = int(os.environ.get("LIME_WORKERS", "4"))
+LIME_BATCH_SIZE = int(os.environ.get("LIME_BATCH_SIZE", "1"))  # perturbed texts per prompt
+SURROGATE_SEED_SAMPLES = int(os.environ.get("SURROGATE_SEED_SAMPLES", "24"))  # perturbations scored by the LLM to fit it
+SURROGATE_MIN_SCORES = int(os.environ.get("SURROGATE_MIN_SCORES", "16"))  # scores needed to fit a surrogate
+SURROGATE_MIN_FIDELITY = float(os.environ.get("SURROGATE_MIN_FIDELITY", "0.5"))  # cross-validated R^2 it must reach
+
+
+# Extract a probability from a single-score response
+def parse_probability(response_text):
+    prob_match = re.search(r'0\.\d+', response_text)
+    if prob_match:
+        return float(prob_match.group(0))
+    elif "1.0" in response_text or "1" == response_text.strip():
+        return 1.0
+    elif "0.0" in response_text or "0" == response_text.strip():
+        return 0.0
+    # Default to middle value if no clear probability
+    metrics.parse_failure("lime_score")
+    return 0.5
+
+
+# Extract {item number: probability} from a numbered multi-score response
+def parse_batch_probabilities(response_text, count):
+    scores = {}
+    for number, value in re.findall(r'^\s*(\d+)\s*[:.)\-]\s*([01](?:\.\d+)?)', response_text, re.MULTILINE):
+        index = int(number) - 1
+        if 0 <= index < count and index not in scores:
+            scores[index] = min(max(float(value), 0.0), 1.0)
+    return scores
+
+
+class SuitabilityScorer:
+    """
+    LIME classifier_fn that rates perturbed candidate texts with the LLM.
+    Duplicate perturbations are scored once, unique texts are scored on a
+    bounded thread pool (optionally several per prompt), and scoring stops
+    when the wall-clock budget runs out. Samples left unscored (out of budget
+    or their LLM call failed) get the mean of the scored ones so they carry
+    no signal into the linear fit.
+    """
+
+    def __init__(self, job_description, model, use_cache=True, max_workers=LIME_WORKERS,
+                 batch_size=LIME_BATCH_SIZE, time_budget=LIME_TIME_BUDGET):
+        self.job_description = job_description
+        self.model = model
+        self.use_cache = use_cache
+        self.max_workers = max(1, max_workers)
+        self.batch_size = max(1, batch_size)
+        self.time_budget = time_budget
+        self.scores = {}
+        self._lock = threading.Lock()
+        self.stats = {
+            "samples": 0,
+            "unique_samples": 0,
+            "scored_samples": 0,
+            "llm_calls": 0,
+            "failed_calls": 0,
+            "budget_exhausted": False,
+            "elapsed_seconds": 0.0,
+        }
+
+    def _ask(self, prompt):
+        # An OllamaError propagates, so the texts of a failed call stay unscored instead of scoring its message
+        with self._lock:
+            self.stats["llm_calls"] += 1
+        return get_client().generate(self.model, prompt, use_cache=self.use_cache)["response"]
+
+    def prompt(self, text):
+        # Create a more concise prompt for LIME that returns a more structured response
+        return f"""
+                Job Description: {self.job_description[:200]}...
+                
+                Candidate Information: {text}
+                
+                Rate how suitable this candidate is for the job on a scale of 0 to 1, where 0 is completely unsuitable and 1 is perfectly suitable.
+                
+                Respond with ONLY a single number between 0 and 1. Do not include any explanation or additional text.
+                """
+
+    def score_one(self, text):
+        return {text: parse_probability(self._ask(self.prompt(text)))}
+
+    def known_scores(self, texts):
+        """
+        Scores already available without calling the LLM: those computed by
+        this scorer plus single-text responses in the LLM cache.
+        """
+        known = {text: self.scores[text] for text in texts if text in self.scores}
+        client = get_client()
+        cache = client.cache if self.use_cache else None
+        if cache is not None:
+            for text in dict.fromkeys(texts):
+                if text in known:
+                    continue
+                payload = {"model": self.model, "prompt": self.prompt(text), "stream": False}
+                cached = cache.get(make_key("/api/generate", payload))
+                if cached is not None:
+                    known[text] = parse_probability(cached["response"])
+        return known
+
+    def score_batch(self, texts):
+        if len(texts) == 1:
+            return self.score_one(texts[0])
+
+        numbered = "\n".join(f"Candidate {i + 1}: {text}" for i, text in enumerate(texts))
+        batch_prompt = f"""
+                Job Description: {self.job_description[:200]}...
+                
+                {numbered}
+                
+                Rate how suitable each candidate above is for the job on a scale of 0 to 1, where 0 is completely unsuitable and 1 is perfectly suitable.
+                
+                Respond with ONLY one line per candidate in the form "<number>: <score>", for example "1: 0.7". Do not include any explanation or additional text.
+                """
+        parsed = parse_batch_probabilities(self._ask(batch_prompt), len(texts))
+
+        scores = {}
+        for i, text in enumerate(texts):
+            if i in parsed:
+                scores[text] = parsed[i]
+            else:
+                # Fall back to a single-text prompt for anything the model skipped; one that fails stays unscored
+                metrics.parse_failure("lime_batch_entry")
+                try:
+                    scores.update(self.score_one(text))
+                except OllamaError:
+                    pass
+        return scores
+
+    def __call__(self, texts):
+        started = time.monotonic()
+        texts = list(texts)
+        pending = [text for text in dict.fromkeys(texts) if text not in self.scores]
+        self.stats["samples"] += len(texts)
+        self.stats["unique_samples"] += len(pending)
+
+        chunks = [pending[i:i + self.batch_size] for i in range(0, len(pending), self.batch_size)]
+        if chunks:
+            # At most max_workers calls in flight; nothing new is started once the budget is spent, but calls
+            # already running are waited for so they release their client slots and their scores are kept
+            deadline = started + self.time_budget if self.time_budget > 0 else None
+            score_batch = metrics.propagate(self.score_batch)
+            queued = iter(chunks)
+            running = set()
+            with ThreadPoolExecutor(max_workers=min(self.max_workers, len(chunks))) as pool:
+                while True:
+                    while len(running) < self.max_workers and (deadline is None or time.monotonic() < deadline):
+                        chunk = next(queued, None)
+                        if chunk is None:
+                            break
+                        running.add(pool.submit(score_batch, chunk))
+                    if not running:
+                        break
+                    done, running = wait(running, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        if future.exception() is None:
+                            self.scores.update(future.result())
+                        else:
+                            self.stats["failed_calls"] += 1
+            if next(queued, None) is not None:
+                self.stats["budget_exhausted"] = True
+
+        scored = [self.scores[text] for text in texts if text in self.scores]
+        self.stats["scored_samples"] = len(self.scores)
+        fill = float(np.mean(scored)) if scored else 0.5
+        probs = np.array([self.scores.get(text, fill) for text in texts])
+
+        self.stats["elapsed_seconds"] = round(self.stats["elapsed_seconds"] + time.monotonic() - started, 3)
+        return np.column_stack([1 - probs, probs])  # [Not Suitable, Suitable]
+
+
+class SurrogateScorer:
+    """
+    LIME classifier_fn that scores perturbations with a local TF-IDF + ridge
+    surrogate instead of one LLM call per sample. On the first call the LLM
+    scores a bounded seed sample of the perturbations (the instance and the
+    first seed_samples - 1 distinct perturbations; LIME's sampling is seeded
+    from the candidate text, so repeat runs ask the same, cached prompts).
+    The surrogate is fitted on those scores plus any others already in the
+    LLM cache; known scores are used as they are and the surrogate predicts
+    the rest. With fewer than min_scores scores (the time budget ran out or
+    calls failed), or a cross-validated R^2 below min_fidelity, the remaining
+    perturbations are scored by the LLM instead; stats report which mode ran
+    and why.
+    """
+
+    def __init__(self, llm_scorer, seed_samples=SURROGATE_SEED_SAMPLES, min_scores=SURROGATE_MIN_SCORES,
+                 min_fidelity=SURROGATE_MIN_FIDELITY):
+        self.llm_scorer = llm_scorer
+        self.seed_samples = max(2, seed_samples)
+        self.min_scores = max(2, min_scores)
+        self.min_fidelity = min_fidelity
+        self.vectorizer = None
+        self.model = None
+        self.known = {}
+        self.fallback = None
+        self.stats = {
+            "mode": "surrogate",
+            "fallback_reason": None,
+            "samples": 0,
+            "seed_samples": 0,
+            "known_scores": 0,
+            "llm_calls": 0,
+            "fidelity": None,
+            "fit_seconds": 0.0,
+            "predict_seconds": 0.0,
+        }
+
+    def fidelity(self, X, scores):
+        """Cross-validated agreement between surrogate predictions and LLM scores."""
+        folds = min(5, len(scores))
+        if folds < 2:
+            return None
+
+        predicted = np.clip(cross_val_predict(Ridge(alpha=1.0), X, scores, cv=KFold(folds)), 0.0, 1.0)
+        variance = float(np.var(scores))
+        r2 = 1 - float(np.mean((scores - predicted) ** 2)) / variance if variance > 0 else None
+        correlation = None
+        if variance > 0 and np.var(predicted) > 0:
+            correlation = float(np.corrcoef(scores, predicted)[0, 1])
+
+        return {
+            "mae": round(float(np.mean(np.abs(scores - predicted))), 4),
+            "r2": round(r2, 4) if r2 is not None else None,
+            "correlation": round(correlation, 4) if correlation is not None else None,
+            "decision_agreement": round(float(np.mean((scores >= 0.5) == (predicted >= 0.5))), 4),
+        }
+
+    def fit(self, texts):
+        started = time.monotonic()
+        seeds = list(dict.fromkeys(texts))[:self.seed_samples]
+        self.llm_scorer(seeds)
+        self.known = self.llm_scorer.known_scores(texts)
+        self.stats["seed_samples"] = len(seeds)
+        self.stats["known_scores"] = len(self.known)
+        self.stats["llm_calls"] = self.llm_scorer.stats["llm_calls"]
+
+        if len(self.known) < self.min_scores:
+            self.fallback = "too_few_scores"
+        else:
+            scored = list(self.known)
+            scores = np.array([self.known[text] for text in scored])
+            # Unnormalized, so removing one word does not shift the weights of all the others
+            self.vectorizer = TfidfVectorizer(token_pattern=r'(?u)\b\w+\b', lowercase=False, sublinear_tf=True,
+                                              norm=None)
+            X = self.vectorizer.fit_transform(scored)
+            self.model = Ridge(alpha=1.0).fit(X, scores)
+            self.stats["fidelity"] = self.fidelity(X, scores)
+
+            # Identical scores leave R^2 undefined; the surrogate then just reproduces that constant
+            r2 = self.stats["fidelity"]["r2"] if self.stats["fidelity"] else None
+            if r2 is not None and r2 < self.min_fidelity:
+                self.fallback = "low_fidelity"
+
+        if self.fallback:
+            # The LLM scorer only has to ask for the perturbations whose score is not known yet
+            self.llm_scorer.scores.update(self.known)
+            self.stats["mode"] = "llm"
+            self.stats["fallback_reason"] = self.fallback
+        self.stats["fit_seconds"] = round(time.monotonic() - started, 3)
+
+    def __call__(self, texts):
+        texts = list(texts)
+        if self.model is None and self.fallback is None:
+            self.fit(texts)
+        self.stats["samples"] += len(texts)
+
+        if self.fallback:
+            probs = self.llm_scorer(texts)
+            self.stats["llm_calls"] = self.llm_scorer.stats["llm_calls"]
+            return probs
+
+        started = time.monotonic()
+        probs = np.clip(self.model.predict(self.vectorizer.transform(texts)), 0.0, 1.0)
+        probs = np.array([self.known.get(text, prob) for text, prob in zip(texts, probs)])
+        self.stats["predict_seconds"] = round(self.stats["predict_seconds"] + time.monotonic() - started, 4)
+        return np.column_stack([1 - probs, probs])  # [Not Suitable, Suitable]
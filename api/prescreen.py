@@ -0,0 +1,106 @@
+import os
+import threading
+
+import numpy as np
+from scipy.sparse import vstack
+from sklearn.feature_extraction.text import HashingVectorizer
+from sklearn.preprocessing import normalize
+
+# Configuration (overridable through the environment)
+PRESCREEN_TOP_K = int(os.environ.get("PRESCREEN_TOP_K", "10"))
+PRESCREEN_FEATURES = 2 ** 18
+
+# Qualification fields only: identity fields (name, age, gender, location) never influence the shortlist
+PRESCREEN_FIELDS = ['job_title', 'skills', 'experience', 'education', 'years_of_experience',
+                    'certifications', 'achievements', 'languages', 'tools', 'projects']
+
+
+# Concatenate the qualification fields the pre-screen compares against the job description
+def candidate_text(candidate):
+    return " ".join(str(candidate[field]) for field in PRESCREEN_FIELDS if candidate.get(field))
+
+
+class Prescreener:
+    """
+    TF-IDF / cosine ranking of candidates against a job description.
+    Term counts come from a stateless HashingVectorizer and are cached per
+    candidate text, so when the candidate file changes only new or edited
+    rows are vectorised; document frequencies and the normalised matrix are
+    then recomputed with a couple of sparse operations.
+    """
+
+    def __init__(self):
+        self.vectorizer = HashingVectorizer(
+            n_features=PRESCREEN_FEATURES, alternate_sign=False, norm=None,
+            stop_words='english', ngram_range=(1, 2)
+        )
+        self._counts = {}
+        self._digest = None
+        self._matrix = None
+        self._idf = None
+        self._lock = threading.Lock()
+
+    def _build(self, index):
+        texts = [candidate_text(candidate) for candidate in index.candidates]
+        missing = [text for text in dict.fromkeys(texts) if text not in self._counts]
+        if missing:
+            for text, row in zip(missing, self.vectorizer.transform(missing)):
+                self._counts[text] = row
+        # Forget rows that are no longer in the file
+        self._counts = {text: self._counts[text] for text in texts}
+
+        if not texts:
+            self._matrix, self._idf = None, None
+            return
+
+        counts = vstack([self._counts[text] for text in texts]).tocsr()
+        document_frequency = np.bincount(counts.indices, minlength=PRESCREEN_FEATURES)
+        self._idf = np.log((1 + len(texts)) / (1 + document_frequency)) + 1
+        self._matrix = normalize(counts.multiply(self._idf).tocsr())
+
+    def scores(self, index, job_description):
+        """Cosine similarity of every candidate in the snapshot to the job description."""
+        with self._lock:
+            if index.digest != self._digest:
+                self._build(index)
+                self._digest = index.digest
+            matrix, idf = self._matrix, self._idf
+
+        if matrix is None:
+            return np.zeros(0)
+        query = normalize(self.vectorizer.transform([job_description]).multiply(idf).tocsr())
+        return (matrix @ query.T).toarray().ravel()
+
+    def shortlist(self, index, rows, job_description, top_k=None, min_score=None):
+        """
+        Ranks rows by similarity and keeps the top_k and/or those scoring at
+        least min_score. Returns (rows, scores) best first.
+        """
+        all_scores = self.scores(index, job_description)
+        ranked = sorted(rows, key=lambda row: -all_scores[row])
+        if min_score is not None:
+            ranked = [row for row in ranked if all_scores[row] >= min_score]
+        if top_k is not None:
+            ranked = ranked[:top_k]
+        return ranked, [round(float(all_scores[row]), 4) for row in ranked]
+
+
+# Read pre-screen settings from a request body, or None when not requested
+def parse_prescreen(data):
+    options = data.get('prescreen')
+    if not options:
+        return None
+    if not isinstance(options, dict):
+        options = {}
+
+    top_k, min_score = None, None
+    try:
+        if options.get('top_k') is not None:
+            top_k = max(1, int(options['top_k']))
+        if options.get('min_score') is not None:
+            min_score = float(options['min_score'])
+    except (TypeError, ValueError):
+        pass
+    if top_k is None and min_score is None:
+        top_k = PRESCREEN_TOP_K
+    return {"top_k": top_k, "min_score": min_score}
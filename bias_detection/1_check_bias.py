@@ -1,16 +1,40 @@
-import pandas as pd
+import os
+import sys
 
-# Load dataset
-df = pd.read_csv('data/stackoverflow_full.csv')
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from common.datasets import read_dataset
+from common.fairness import PROTECTED_ATTRIBUTES, intersectional_report
+from common.streaming import STREAMING, GroupShares, SubgroupCounts, ValueCounts, aggregate
 
-# Check gender balance
-gender_counts = df['Gender'].value_counts()
-print("Gender Distribution:\n", gender_counts)
+if STREAMING:
+    # One pass over fixed-size chunks (PIPELINE_STREAMING=1), for exports too large to load at once
+    gender_counts, hiring_shares, subgroups = aggregate(
+        'data/stackoverflow_full.csv',
+        [ValueCounts('Gender'), GroupShares('Gender', 'Employed'), SubgroupCounts(PROTECTED_ATTRIBUTES, decision=None)],
+        columns=PROTECTED_ATTRIBUTES + ['Employed'],
+    )
+    gender_counts = gender_counts.result()
+    hiring_bias = hiring_shares.result()
+    intersectional_bias = subgroups.intersectional_report(max_order=3)
+else:
+    # Load dataset (only the protected attributes and Employed, from the columnar cache)
+    df = read_dataset('data/stackoverflow_full.csv', columns=PROTECTED_ATTRIBUTES + ['Employed'])
+
+    # Check gender balance
+    gender_counts = df['Gender'].value_counts()
+
+    # Check hiring bias
+    hiring_bias = df.groupby('Gender')['Employed'].value_counts(normalize=True).unstack()
 
-# Check hiring bias
-hiring_bias = df.groupby('Gender')['Employed'].value_counts(normalize=True).unstack()
+    # Check hiring bias for every combination of up to three protected attributes (e.g. Gender x Country x Age),
+    # leaving out subgroups too small to compare
+    intersectional_bias = intersectional_report(df, PROTECTED_ATTRIBUTES, max_order=3)
+
+print("Gender Distribution:\n", gender_counts)
 print("\nHiring Bias:\n", hiring_bias)
+print("\nLeast hired intersectional subgroups:\n", intersectional_bias.nsmallest(10, 'Selection Ratio'))
 
 # Save results
 gender_counts.to_csv('data/gender_distribution.csv')
 hiring_bias.to_csv('data/hiring_bias.csv')
+intersectional_bias.to_csv('data/intersectional_bias.csv', index=False)
@@ -1,12 +1,21 @@
-import pandas as pd
+import os
+import sys
 
-# Load the original dataset
-applicants = pd.read_csv('data/stackoverflow_full.csv')
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from common.datasets import read_dataset
+from common.streaming import STREAMING, write_head
 
-# Select the first 200 rows
-subset_data = applicants.head(200)
+if STREAMING:
+    # Read only as far as the first 200 rows
+    write_head('data/stackoverflow_full.csv', 'data/subsetdata.csv', 200)
+else:
+    # Load the original dataset (from the columnar cache)
+    applicants = read_dataset('data/stackoverflow_full.csv')
 
-# Save the subset to a new CSV file
-subset_data.to_csv('data/subsetdata.csv', index=False)
+    # Select the first 200 rows
+    subset_data = applicants.head(200)
+
+    # Save the subset to a new CSV file
+    subset_data.to_csv('data/subsetdata.csv', index=False)
 
 print("Subset data saved to 'subsetdata.csv'")
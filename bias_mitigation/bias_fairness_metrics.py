@@ -1,69 +1,38 @@
+import os
+import sys
 import pandas as pd
 
-# Load the Ollama predictions (contains Gender and Decision)
-pred_df = pd.read_csv('predictions_output/ollama_predictions_counterfactual.csv')
-
-# Load the original dataset (contains Gender and Employed columns)
-original_data = pd.read_csv('data/stackoverflow_full.csv')  # Or whichever original file you used
-
-# Ensure the 'Employed' column is available from the original dataset
-# Merge the original dataset's 'Employed' column with the predictions dataframe based on the index
-merged_df = pred_df.copy()
-merged_df['Employed'] = original_data['Employed'][:len(pred_df)]  # Assuming first 200 rows match
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from common.datasets import read_dataset
+from common.fairness import SOURCE_ID, attach_labels, bootstrap_gaps, fairness_table
+from common.streaming import STREAMING, attach_labels_chunked
 
-# Now you can calculate Equalized Odds, Demographic Parity, or any other fairness metric using the merged dataframe.
-
-# Function to calculate Demographic Parity
-def demographic_parity(pred_df):
-    dp = pred_df.groupby('CounterfactualGender')['Decision'].mean()  # Mean proportion of "Yes" decisions across all genders
-    return dp
+# Load the Ollama predictions (contains ApplicantId, OriginalGender, CounterfactualGender and Decision)
+pred_df = pd.read_csv('predictions_output/ollama_predictions_counterfactual.csv')
 
-# Function to calculate Equalized Odds (False Positive Rate & False Negative Rate)
-def equalized_odds(pred_df):
-    fp = pred_df[(pred_df['Decision'] == 1) & (pred_df['Employed'] == 0)]  # False positives (unqualified hired)
-    fn = pred_df[(pred_df['Decision'] == 0) & (pred_df['Employed'] == 1)]  # False negatives (qualified rejected)
-    
-    # Calculate rates per gender
-    fp_rate = fp.groupby('CounterfactualGender').size() / pred_df.groupby('CounterfactualGender').size()
-    fn_rate = fn.groupby('CounterfactualGender').size() / pred_df.groupby('CounterfactualGender').size()
-    
-    return fp_rate, fn_rate
+if STREAMING:
+    # Scan the original dataset in chunks, keeping only the predicted applicants' 'Employed' values
+    merged_df = attach_labels_chunked(pred_df, 'data/stackoverflow_full.csv')
+else:
+    # Load the original dataset (only the id and Employed columns are needed)
+    original_data = read_dataset('data/stackoverflow_full.csv', columns=[SOURCE_ID, 'Employed'])
 
-# Function to calculate Predictive Rate Parity
-def predictive_rate_parity(pred_df):
-    qualified = pred_df[pred_df['Employed'] == 1]
-    unqualified = pred_df[pred_df['Employed'] == 0]
-    
-    qualified_rate = qualified.groupby('CounterfactualGender')['Decision'].mean()  # Rate of positive predictions for qualified candidates
-    unqualified_rate = unqualified.groupby('CounterfactualGender')['Decision'].mean()  # Rate of positive predictions for unqualified candidates
-    
-    return qualified_rate, unqualified_rate
+    # Look up each prediction's 'Employed' value by applicant id
+    merged_df = attach_labels(pred_df, original_data)
 
 # Calculate and save all fairness metrics
 print("Calculating fairness metrics...\n")
 
-# Demographic Parity Calculation
-dp = demographic_parity(merged_df)
-
-# Equalized Odds Calculation
-fp_rate, fn_rate = equalized_odds(merged_df)
-
-# Predictive Rate Parity Calculation
-qualified_rate, unqualified_rate = predictive_rate_parity(merged_df)
-
-# Prepare results to save to CSV
-results = {
-    'Demographic Parity': dp,
-    'False Positive Rate (Equalized Odds)': fp_rate,
-    'False Negative Rate (Equalized Odds)': fn_rate,
-    'Qualified Rate (Predictive Rate Parity)': qualified_rate,
-    'Unqualified Rate (Predictive Rate Parity)': unqualified_rate
-}
-
-# Convert the results to DataFrame
-results_df = pd.DataFrame(results)
+# Demographic Parity, Equalized Odds and Predictive Rate Parity per counterfactual gender, in one pass
+results_df = fairness_table(merged_df, protected='CounterfactualGender')
 
 # Save the results to CSV
 results_df.to_csv('predictions_output/fairness_metrics_results_counterfactual.csv', index=False)
 
 print(f"Fairness metrics saved to 'predictions_output/fairness_metrics_results_counterfactual.csv'")
+
+# 95% bootstrap confidence intervals for the between-group gaps
+intervals = bootstrap_gaps(merged_df, protected='CounterfactualGender', seed=42)
+print(intervals)
+intervals.to_csv('predictions_output/fairness_gap_intervals_counterfactual.csv', index_label='Gap')
+print(f"Gap confidence intervals saved to 'predictions_output/fairness_gap_intervals_counterfactual.csv'")
@@ -1,30 +1,27 @@
+import os
+import sys
 import pandas as pd
 
-# Load the subset data
-applicants = pd.read_csv('data/subsetdata.csv')
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from common.counterfactual import add_counterfactual_gender
+from common.streaming import STREAMING, write_counterfactuals
 
-# Clean up any leading/trailing spaces and capitalize gender values consistently
-applicants['Gender'] = applicants['Gender'].str.strip().str.capitalize()
+if STREAMING:
+    # Chunk by chunk, so any number of applicants fits in memory
+    genders, counterfactual_genders = write_counterfactuals('data/subsetdata.csv', 'data/counterfactual_subset.csv')
+else:
+    # Load the subset data
+    applicants = pd.read_csv('data/subsetdata.csv')
 
-# Check if the gender values are as expected after cleaning
-print("Unique Gender values before modification:", applicants['Gender'].unique())
+    # Strip gender values (keeping their spelling) and create counterfactuals by swapping them
+    # (Man <-> Woman, NonBinary -> Man, anything else unchanged)
+    applicants = add_counterfactual_gender(applicants)
+    genders, counterfactual_genders = applicants['Gender'].unique(), applicants['CounterfactualGender'].unique()
 
-# Create counterfactuals: Swap gender values
-def counterfactual_gender(row):
-    if row['Gender'] == 'Man':
-        return 'Woman'
-    elif row['Gender'] == 'Woman':
-        return 'Man'
-    elif row['Gender'] == 'Nonbinary':  # Be sure it's consistent with how NonBinary is stored
-        return 'Man'  # For simplicity, we'll switch NonBinary to Man here
-    return row['Gender']  # Return unchanged if gender is neither of the above
+    # Save the augmented data (counterfactuals)
+    applicants.to_csv('data/counterfactual_subset.csv', index=False)
 
-# Apply counterfactual gender modification
-applicants['CounterfactualGender'] = applicants.apply(counterfactual_gender, axis=1)
-
-# Check the unique values in CounterfactualGender to ensure the transformation worked
-print("Unique values in CounterfactualGender after modification:", applicants['CounterfactualGender'].unique())
-
-# Save the augmented data (counterfactuals)
-applicants.to_csv('data/counterfactual_subset.csv', index=False)
+# Check the gender values after cleaning and that the transformation worked
+print("Unique Gender values before modification:", genders)
+print("Unique values in CounterfactualGender after modification:", counterfactual_genders)
 print("Counterfactual data (gender modification) saved to 'counterfactual_subset.csv'")
@@ -0,0 +1,15 @@
+import os
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from common.counterfactual import counterfactual_csv
+
+# Gender-swap the free text of the cleaned resumes (pronouns, titles, first names, gendered words such as
+# fraternity/sorority), one pass per text; large files are streamed and split across processes
+pairs = counterfactual_csv('data/cleaned_resumes.csv', 'data/counterfactual_resumes.csv', columns=['Resume'])
+print(f"{pairs} resume pairs saved to 'counterfactual_resumes.csv'")
+
+# Same for the API candidate fields
+pairs = counterfactual_csv('api/candidates.csv', 'data/counterfactual_candidates.csv',
+                           columns=['name', 'gender', 'education', 'skills', 'experience'])
+print(f"{pairs} candidate pairs saved to 'counterfactual_candidates.csv'")
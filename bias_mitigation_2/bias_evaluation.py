@@ -1,46 +1,23 @@
+import os
+import sys
 import pandas as pd
-# Load new CoT-based predictions
-pred_df = pd.read_csv('predictions_output/ollama_predictions_cot.csv')
-
-# Function to calculate Demographic Parity
-def demographic_parity(pred_df):
-    dp = pred_df.groupby('Gender')['Decision'].mean()
-    return dp
 
-# Function to calculate Equalized Odds
-def equalized_odds(pred_df):
-    fp = pred_df[(pred_df['Decision'] == 1) & (pred_df['Employed'] == 0)]
-    fn = pred_df[(pred_df['Decision'] == 0) & (pred_df['Employed'] == 1)]
-    
-    fp_rate = fp.groupby('Gender').size() / pred_df.groupby('Gender').size()
-    fn_rate = fn.groupby('Gender').size() / pred_df.groupby('Gender').size()
-    
-    return fp_rate.fillna(0), fn_rate.fillna(0)
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from common.fairness import bootstrap_gaps, fairness_table
 
-# Function to calculate Predictive Rate Parity
-def predictive_rate_parity(pred_df):
-    qualified = pred_df[pred_df['Employed'] == 1]
-    unqualified = pred_df[pred_df['Employed'] == 0]
-    
-    qualified_rate = qualified.groupby('Gender')['Decision'].mean()
-    unqualified_rate = unqualified.groupby('Gender')['Decision'].mean()
-    
-    return qualified_rate.fillna(0), unqualified_rate.fillna(0)
+# Load new CoT-based predictions (each row keeps its profile, including Employed)
+pred_df = pd.read_csv('predictions_output/ollama_predictions_cot.csv')
 
-# Calculate fairness metrics
-dp = demographic_parity(pred_df)
-fp_rate, fn_rate = equalized_odds(pred_df)
-qualified_rate, unqualified_rate = predictive_rate_parity(pred_df)
+# Calculate fairness metrics (groups without qualified or unqualified candidates count as 0)
+fairness_results = fairness_table(pred_df, protected='Gender').fillna(0)
 
 # Save fairness results to CSV
-fairness_results = pd.DataFrame({
-    'Demographic Parity': dp,
-    'False Positive Rate (Equalized Odds)': fp_rate,
-    'False Negative Rate (Equalized Odds)': fn_rate,
-    'Qualified Rate (Predictive Rate Parity)': qualified_rate,
-    'Unqualified Rate (Predictive Rate Parity)': unqualified_rate
-})
-
 fairness_results.to_csv("predictions_output/fairness_metrics_cot.csv", index=True)
 
 print("Fairness metrics after CoT saved successfully.")
+
+# 95% bootstrap confidence intervals for the between-group gaps
+intervals = bootstrap_gaps(pred_df, protected='Gender', seed=42)
+print(intervals)
+intervals.to_csv('predictions_output/fairness_gap_intervals_cot.csv', index_label='Gap')
+print(f"Gap confidence intervals saved to 'predictions_output/fairness_gap_intervals_cot.csv'")
@@ -0,0 +1,189 @@
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from tqdm import tqdm
+
+from common import metrics
+from common.ollama_client import get_client, OllamaError, PREFIX_REUSE
+
+# Candidates per prompt for the pipeline scripts (1 keeps one prompt per candidate)
+BATCH_SIZE = int(os.environ.get("LLM_BATCH_SIZE", "1"))
+
+
+def extract_json(text):
+    """Parse the JSON object in a model response, tolerating text around it. Returns None on failure."""
+    try:
+        return json.loads(text)
+    except ValueError:
+        pass
+    start, end = text.find("{"), text.rfind("}")
+    if start != -1 and end > start:
+        try:
+            return json.loads(text[start:end + 1])
+        except ValueError:
+            return None
+    return None
+
+
+def run_batched(texts, model, build_prompt, validate, single_prompt, batch_size,
+                use_cache=True, max_workers=1, progress=None, options=None):
+    """
+    Evaluates several items per prompt and parses a JSON object keyed by item id.
+
+    texts:          rendered item sections, one per item
+    build_prompt:   called with [(item_id, text), ...], returns the batched prompt
+    validate:       normalises one parsed JSON value, or returns None if it is unusable
+    single_prompt:  the equivalent one-item prompt, used only to estimate savings
+    Returns (values, stats). values[i] is None for items the model skipped or
+    answered badly, so the caller can fall back to its single-item prompt.
+    """
+    batches = [list(range(start, min(start + batch_size, len(texts))))
+               for start in range(0, len(texts), batch_size)]
+    values = [None] * len(texts)
+    calls = []
+
+    def run(batch):
+        ids = [f"C{i + 1}" for i in range(len(batch))]
+        prompt = build_prompt(list(zip(ids, (texts[i] for i in batch))))
+        started = time.monotonic()
+        try:
+            body = get_client().generate(model, prompt, options=options, use_cache=use_cache, format="json")
+        except OllamaError:
+            body = {"response": ""}
+        parsed = extract_json(body.get("response", "")) or {}
+        for item_id, index in zip(ids, batch):
+            values[index] = validate(parsed.get(item_id))
+            if values[index] is None:
+                metrics.parse_failure("batch_entry")
+        calls.append((prompt, body, time.monotonic() - started))
+        if progress is not None:
+            progress(len(batch))
+
+    started = time.monotonic()
+    if max_workers > 1 and len(batches) > 1:
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(batches))) as pool:
+            list(pool.map(metrics.propagate(run), batches))
+    else:
+        for batch in batches:
+            run(batch)
+
+    return values, batch_stats(texts, values, calls, single_prompt, batch_size, time.monotonic() - started)
+
+
+def batch_stats(texts, values, calls, single_prompt, batch_size, elapsed):
+    """
+    Compares the batched run with one-prompt-per-item. Token counts and timings
+    come from Ollama's prompt_eval/eval counters; the per-item figures are
+    estimated from the measured chars-per-token and seconds-per-token rates.
+    """
+    prompt_chars = sum(len(prompt) for prompt, _, _ in calls)
+    single_chars = sum(len(single_prompt(text)) for text in texts)
+    prompt_tokens = sum(body.get("prompt_eval_count", 0) for _, body, _ in calls)
+    output_tokens = sum(body.get("eval_count", 0) for _, body, _ in calls)
+    prompt_ns = sum(body.get("prompt_eval_duration", 0) for _, body, _ in calls)
+    output_ns = sum(body.get("eval_duration", 0) for _, body, _ in calls)
+
+    stats = {
+        "batch_size": batch_size,
+        "items": len(texts),
+        "prompts": len(calls),
+        "fallbacks": sum(value is None for value in values),
+        "prompt_chars": prompt_chars,
+        "per_candidate_prompt_chars": single_chars,
+        "prompt_reduction": round(1 - prompt_chars / single_chars, 4) if single_chars else 0.0,
+        "prompt_tokens": prompt_tokens or None,
+        "per_candidate_prompt_tokens_estimate": None,
+        "llm_seconds": round(sum(seconds for _, _, seconds in calls), 3),
+        "per_candidate_llm_seconds_estimate": None,
+        "elapsed_seconds": round(elapsed, 3),
+    }
+
+    if prompt_tokens and prompt_chars:
+        single_tokens = prompt_tokens * single_chars / prompt_chars
+        stats["per_candidate_prompt_tokens_estimate"] = int(single_tokens)
+        if prompt_ns:
+            # Same answers, but every item re-reads the shared context
+            seconds = single_tokens * prompt_ns / prompt_tokens / 1e9
+            if output_tokens and output_ns:
+                seconds += output_ns / 1e9
+            stats["per_candidate_llm_seconds_estimate"] = round(seconds, 3)
+    return stats
+
+
+# Pipeline prompt used by the prediction scripts for a single candidate, split where the profile starts
+def hire_prefix(job_description):
+    return f"Given this job description:\n{job_description}\n\nWould you hire this candidate based on their profile?\n"
+
+
+def hire_suffix(profile):
+    return f"{profile}\n\nRespond with 'Yes' or 'No'."
+
+
+def hire_prompt(job_description, profile):
+    return hire_prefix(job_description) + hire_suffix(profile)
+
+
+# Pipeline prompt asking for several candidates at once
+def hire_batch_prompt(job_description, items):
+    candidates = "\n\n".join(f"Candidate {item_id}:\n{profile}" for item_id, profile in items)
+    ids = ", ".join(f'"{item_id}": "Yes"' for item_id, _ in items[:2])
+    return (
+        f"Given this job description:\n{job_description}\n\n"
+        f"Would you hire each of these candidates based on their profile?\n\n{candidates}\n\n"
+        f"Respond with ONLY a JSON object mapping every candidate id to 'Yes' or 'No', for example {{{ids}}}."
+    )
+
+
+def validate_hire(value):
+    if isinstance(value, str) and value.strip().lower() in ("yes", "no"):
+        return value.strip().lower()
+    return None
+
+
+def hire_decisions(model, job_description, profiles, batch_size=BATCH_SIZE, desc="Predicting",
+                   prefix_reuse=PREFIX_REUSE, progress=True, options=None):
+    """
+    Yes/No hiring decisions (1/0) for the prediction scripts. With batch_size > 1
+    candidates are asked about in groups and anything that fails to parse is
+    re-asked with the single-candidate prompt. With prefix_reuse the job
+    description is evaluated once and single prompts continue from its
+    context tokens. progress=False hides the bar for callers that show their
+    own; options (e.g. a fixed seed) are passed to every model call.
+    Returns (decisions, stats).
+    """
+    profiles = [str(profile) for profile in profiles]
+    client = get_client()
+    prefix = client.prefix(model, hire_prefix(job_description)) if prefix_reuse else None
+
+    def ask_single(profile):
+        if prefix is not None:
+            decision = prefix.generate(hire_suffix(profile), options=options)['response'].strip()
+        else:
+            response = client.chat(model=model, messages=[{"role": "user", "content": hire_prompt(job_description, profile)}],
+                                   options=options)
+            decision = response['message']['content'].strip()
+        return 1 if decision.lower() == 'yes' else 0
+
+    with tqdm(total=len(profiles), desc=desc, unit="candidate", disable=not progress) as bar:
+        if batch_size <= 1:
+            decisions = []
+            for profile in profiles:
+                decisions.append(ask_single(profile))
+                bar.update(1)
+            return decisions, (dict(prefix.stats) if prefix is not None else None)
+
+        values, stats = run_batched(
+            profiles, model,
+            lambda items: hire_batch_prompt(job_description, items),
+            validate_hire,
+            lambda profile: hire_prompt(job_description, profile),
+            batch_size,
+            progress=bar.update,
+            options=options
+        )
+
+    decisions = [ask_single(profile) if value is None else int(value == "yes")
+                 for profile, value in zip(profiles, values)]
+    return decisions, stats
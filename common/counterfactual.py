@@ -0,0 +1,288 @@
+import hashlib
+import re
+import threading
+from functools import partial
+
+import pandas as pd
+
+from common.text_cleaning import CLEAN_CHUNK_ROWS, CLEAN_WORKERS, map_csv
+
+# Gender used for the counterfactual twin of a profile, looked up capitalized (NonBinary and nonbinary match
+# Nonbinary); anything else is left unchanged
+GENDER_SWAP = {'Man': 'Woman', 'Woman': 'Man', 'Nonbinary': 'Man'}
+
+
+def swap_gender(gender):
+    return GENDER_SWAP.get(str(gender).strip().capitalize(), gender)
+
+
+def add_counterfactual_gender(applicants):
+    """
+    Applicants with surrounding spaces stripped from Gender and a
+    CounterfactualGender column holding the swapped value. Gender keeps its
+    spelling (NonBinary stays NonBinary), so prompts built from it match
+    those of the source data and are served from the LLM cache.
+    """
+    applicants = applicants.copy()
+    applicants['Gender'] = applicants['Gender'].str.strip()
+    swapped = applicants['Gender'].str.capitalize().map(GENDER_SWAP)
+    applicants['CounterfactualGender'] = swapped.where(swapped.notna(), applicants['Gender'])
+    return applicants
+
+
+def pair_profiles(row):
+    """
+    The original and gender-swapped profile for a row. Only the Gender field
+    differs between the two; a CounterfactualGender column (as written by
+    counterfactual_data_augmentation.py) picks the swapped value and is left
+    out of both, so neither prompt shows the other gender.
+    """
+    original = {key: value for key, value in row.items() if key != 'CounterfactualGender'}
+    counterfactual = dict(original)
+    swapped = row.get('CounterfactualGender')
+    # A blank cell comes back from a CSV as NaN, which is truthy; use the mapping for it as for a missing column
+    counterfactual['Gender'] = swapped if pd.notna(swapped) and str(swapped).strip() else swap_gender(row['Gender'])
+    return original, counterfactual
+
+
+class FlipRateTracker:
+    """
+    Running decision flip rate and per-group parity over finished pairs.
+    Groups are keyed by the original gender: original_rate is the share hired
+    as they are, counterfactual_rate the share hired once their gender is
+    swapped. The parity gap is the spread of original_rate across groups.
+    """
+
+    def __init__(self):
+        self.pairs = 0
+        self.flips = 0
+        self.yes_to_no = 0
+        self.no_to_yes = 0
+        self.groups = {}
+        self._lock = threading.Lock()
+
+    def update(self, record):
+        original, counterfactual = int(record['OriginalDecision']), int(record['Decision'])
+        with self._lock:
+            group = self.groups.setdefault(record['OriginalGender'],
+                                           {"pairs": 0, "original_yes": 0, "counterfactual_yes": 0, "flips": 0})
+            group["pairs"] += 1
+            group["original_yes"] += original
+            group["counterfactual_yes"] += counterfactual
+            self.pairs += 1
+            if original != counterfactual:
+                group["flips"] += 1
+                self.flips += 1
+                if original:
+                    self.yes_to_no += 1
+                else:
+                    self.no_to_yes += 1
+
+    def summary(self):
+        with self._lock:
+            groups = {
+                name: {
+                    "pairs": group["pairs"],
+                    "original_rate": round(group["original_yes"] / group["pairs"], 4),
+                    "counterfactual_rate": round(group["counterfactual_yes"] / group["pairs"], 4),
+                    "flip_rate": round(group["flips"] / group["pairs"], 4),
+                }
+                for name, group in sorted(self.groups.items(), key=lambda item: str(item[0]))
+            }
+            rates = [group["original_rate"] for group in groups.values()]
+            return {
+                "pairs": self.pairs,
+                "flips": self.flips,
+                "flip_rate": round(self.flips / self.pairs, 4) if self.pairs else 0.0,
+                "yes_to_no": self.yes_to_no,
+                "no_to_yes": self.no_to_yes,
+                "parity_gap": round(max(rates) - min(rates), 4) if rates else 0.0,
+                "groups": groups,
+            }
+
+    def postfix(self):
+        """Short form for a progress bar."""
+        summary = self.summary()
+        return {"flip_rate": f"{summary['flip_rate']:.3f}", "parity_gap": f"{summary['parity_gap']:.3f}"}
+
+
+# Gendered words and their counterparts, matched case-insensitively as whole words in both directions. Where a
+# word has several counterparts (her -> his or him) the first pair listing it wins. Words with a common
+# non-gendered reading in resumes (ms as in MS Office, miss, host, mom as in minutes of meeting) are left out.
+GENDERED_TERMS = [
+    ('he', 'she'), ('his', 'her'), ('him', 'her'), ('his', 'hers'), ('himself', 'herself'),
+    ('man', 'woman'), ('men', 'women'), ('male', 'female'), ('males', 'females'),
+    ('boy', 'girl'), ('boys', 'girls'), ('guy', 'gal'), ('guys', 'gals'),
+    ('gentleman', 'lady'), ('gentlemen', 'ladies'), ('sir', 'madam'), ('mr', 'mrs'),
+    ('father', 'mother'), ('fathers', 'mothers'), ('son', 'daughter'), ('sons', 'daughters'),
+    ('brother', 'sister'), ('brothers', 'sisters'), ('husband', 'wife'), ('boyfriend', 'girlfriend'),
+    ('uncle', 'aunt'), ('nephew', 'niece'), ('grandfather', 'grandmother'), ('grandson', 'granddaughter'),
+    ('paternity', 'maternity'), ('paternal', 'maternal'), ('masculine', 'feminine'),
+    ('fraternity', 'sorority'), ('fraternities', 'sororities'), ('brotherhood', 'sisterhood'),
+    ('king', 'queen'), ('prince', 'princess'), ('actor', 'actress'), ('waiter', 'waitress'),
+    ('steward', 'stewardess'), ('chairman', 'chairwoman'), ('chairmen', 'chairwomen'),
+    ('spokesman', 'spokeswoman'), ('businessman', 'businesswoman'), ('businessmen', 'businesswomen'),
+    ('salesman', 'saleswoman'), ('salesmen', 'saleswomen'), ('craftsman', 'craftswoman'),
+    ('sportsman', 'sportswoman'), ('congressman', 'congresswoman'), ('alumnus', 'alumna'),
+]
+
+# First names swapped with a counterpart of the other gender, covering the candidate file and common names in
+# the resume corpus. Names that are also ordinary words (Mark, Will, Grace, Harsh) are left out.
+NAME_PAIRS = [
+    ('john', 'mary'), ('james', 'jennifer'), ('david', 'sarah'), ('michael', 'emma'), ('robert', 'linda'),
+    ('william', 'elizabeth'), ('richard', 'susan'), ('joseph', 'jessica'), ('thomas', 'karen'),
+    ('charles', 'nancy'), ('christopher', 'lisa'), ('daniel', 'margaret'), ('matthew', 'ashley'),
+    ('anthony', 'sandra'), ('steven', 'emily'), ('paul', 'michelle'), ('andrew', 'amanda'),
+    ('joshua', 'melissa'), ('kevin', 'stephanie'), ('brian', 'rebecca'), ('ryan', 'laura'), ('jacob', 'olivia'),
+    ('eric', 'anna'), ('peter', 'julia'), ('carlos', 'maria'), ('juan', 'ana'), ('ahmed', 'aisha'),
+    ('mohammed', 'fatima'), ('wei', 'lin'), ('rahul', 'priya'), ('amit', 'pooja'), ('rohit', 'sneha'),
+    ('vikram', 'divya'), ('arjun', 'ananya'), ('sanjay', 'kavya'), ('rajesh', 'lakshmi'), ('suresh', 'swati'),
+    ('ravi', 'neha'), ('akash', 'shreya'),
+]
+
+
+def counterparts(pairs):
+    """Both directions of a list of (masculine, feminine) pairs, the first pair listing a word winning."""
+    swaps = {}
+    for first, second in pairs:
+        swaps.setdefault(first, second)
+        swaps.setdefault(second, first)
+    return swaps
+
+
+def trie_pattern(words):
+    """
+    Regular expression matching any of the words, built from their prefix
+    trie so shared prefixes are tested once: ['he', 'her', 'hers'] becomes
+    'he(?:r(?:s)?)?'. Longer words are preferred where several match.
+    """
+    trie = {}
+    for word in words:
+        node = trie
+        for char in word:
+            node = node.setdefault(char, {})
+        node[''] = {}
+
+    def emit(node):
+        branches = [re.escape(char) + emit(child) for char, child in sorted(node.items()) if char]
+        if not branches:
+            return ''
+        body = branches[0] if len(branches) == 1 and len(branches[0]) == 1 else f"(?:{'|'.join(branches)})"
+        return body + '?' if '' in node else body
+
+    return emit(trie)
+
+
+def match_case(word, source):
+    """word written in the case of source (UPPER, Title or lower)."""
+    if len(source) > 1 and source.isupper():
+        return word.upper()
+    if source[:1].isupper():
+        return word[:1].upper() + word[1:]
+    return word
+
+
+class GenderSwapper:
+    """
+    Rewrites free text into its gender counterfactual: gendered words and
+    first names are replaced by their counterparts. The whole lexicon is
+    compiled into one trie-shaped pattern, so each text is rewritten in a
+    single pass however many words it holds.
+    """
+
+    def __init__(self, terms=GENDERED_TERMS, names=NAME_PAIRS):
+        self.swaps = {**counterparts(names), **counterparts(terms)}
+        # Looking ahead for a possible first letter lets most positions be rejected before entering the trie
+        first = ''.join(sorted({re.escape(word[0]) for word in self.swaps}))
+        self.pattern = re.compile(rf"\b(?=[{first}])(?:{trie_pattern(self.swaps)})\b", re.IGNORECASE)
+
+    def _replace(self, match):
+        word = match.group(0)
+        return match_case(self.swaps[word.lower()], word)
+
+    def swap(self, text):
+        """(counterfactual text, number of words replaced). Missing values stay missing."""
+        if not isinstance(text, str):
+            return text, 0
+        return self.pattern.subn(self._replace, text)
+
+
+SWAPPER = GenderSwapper()
+
+
+def swap_gendered_text(text):
+    return SWAPPER.swap(text)[0]
+
+
+def pair_id(values):
+    """Stable id of a profile: a hash of its field values, the same on every run and machine."""
+    digest = hashlib.sha256('\x1f'.join('' if value is None or value != value else str(value)
+                                         for value in values).encode('utf-8'))
+    return digest.hexdigest()[:16]
+
+
+def counterfactual_column(column):
+    return f"Counterfactual{column[:1].upper()}{column[1:]}"
+
+
+def add_text_counterfactuals(frame, columns):
+    """
+    frame with a PairId column first, a Counterfactual<column> column next to
+    each of the given text columns and the number of words swapped in
+    Substitutions. PairId hashes every original column, so identical rows
+    share an id; DuplicateNumbering tells them apart.
+    """
+    frame = frame.copy()
+    substitutions = 0
+    for column in columns:
+        swapped, counts = zip(*map(SWAPPER.swap, frame[column])) if len(frame) else ((), ())
+        frame.insert(frame.columns.get_loc(column) + 1, counterfactual_column(column),
+                     pd.Series(swapped, index=frame.index, dtype=frame[column].dtype))
+        substitutions = substitutions + pd.Series(counts, index=frame.index, dtype='int64')
+    original = frame.drop(columns=[counterfactual_column(column) for column in columns])
+    frame.insert(0, 'PairId', [pair_id(values) for values in original.itertuples(index=False)])
+    frame['Substitutions'] = substitutions
+    return frame
+
+
+class DuplicateNumbering:
+    """
+    Suffixes the PairId of repeated rows (-1, -2, ...) in the order they are
+    seen, so every pair has a distinct id that stays the same between runs
+    over the same file. Callable on successive chunks of one file.
+    """
+
+    def __init__(self):
+        self.seen = {}
+
+    def __call__(self, frame):
+        ids = []
+        for value in frame['PairId']:
+            count = self.seen.get(value, 0)
+            self.seen[value] = count + 1
+            ids.append(f"{value}-{count}" if count else value)
+        frame['PairId'] = ids
+        return frame
+
+
+def counterfactual_csv(input_path, output_path, columns, chunksize=CLEAN_CHUNK_ROWS, workers=CLEAN_WORKERS):
+    """
+    Original/counterfactual pairs of the text columns of a CSV, streamed
+    chunk by chunk into output_path (in a process pool for large files).
+    Every column is read as text, so PairId hashes the values as written in
+    the file whatever the chunk size, and they are written back unchanged.
+    Returns the number of pairs written.
+    """
+    return map_csv(input_path, output_path, partial(add_text_counterfactuals, columns=list(columns)), chunksize,
+                   workers, dtype=str, finish=DuplicateNumbering())
+
+
+def counterfactual_candidate(candidate):
+    """
+    (pair id, counterfactual) of an API candidate: the same fields with every
+    text value (name, gender, experience, ...) gender-swapped. For a candidate
+    read from a CSV as text, the id is the PairId counterfactual_csv gives its row.
+    """
+    counterfactual = {field: swap_gendered_text(value) if isinstance(value, str) else value
+                      for field, value in candidate.items()}
+    return pair_id(candidate.values()), counterfactual
@@ -0,0 +1,140 @@
+import argparse
+import hashlib
+import json
+import os
+import time
+import warnings
+
+import pandas as pd
+
+try:
+    import pyarrow  # noqa: F401  (needed by pandas for Parquet)
+    PARQUET_AVAILABLE = True
+except ImportError:
+    PARQUET_AVAILABLE = False
+
+# Configuration (overridable through the environment)
+DATASET_CACHE_DIR = os.environ.get(
+    "DATASET_CACHE_DIR",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", ".cache", "datasets"),
+)
+DATASET_CACHE_DISABLED = os.environ.get("DATASET_CACHE_DISABLED", "").lower() in ("1", "true", "yes")
+
+# Text columns with at most this share of distinct values are stored as categoricals
+CATEGORY_MAX_RATIO = 0.5
+
+# Bumped when the conversion changes, so older caches are rebuilt
+CACHE_VERSION = 1
+
+
+def file_hash(path, block_size=1 << 20):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as file:
+        for block in iter(lambda: file.read(block_size), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def cache_paths(path):
+    # One cache per source file, named after it so the cache directory stays readable
+    source = os.path.abspath(path)
+    name = f"{os.path.splitext(os.path.basename(source))[0]}-{hashlib.sha256(source.encode('utf-8')).hexdigest()[:12]}"
+    base = os.path.join(os.path.abspath(DATASET_CACHE_DIR), name)
+    return base + ".parquet", base + ".json"
+
+
+def convert(frame):
+    """Typed version of a parsed CSV: low-cardinality text as categoricals, integers in the smallest dtype."""
+    columns = {}
+    for name, column in frame.items():
+        if pd.api.types.is_string_dtype(column.dtype) and column.nunique() <= CATEGORY_MAX_RATIO * max(len(column), 1):
+            columns[name] = column.astype('category')
+        elif pd.api.types.is_integer_dtype(column) and not pd.api.types.is_bool_dtype(column):
+            columns[name] = pd.to_numeric(column, downcast='integer')
+        else:
+            columns[name] = column
+    return pd.DataFrame(columns)
+
+
+def _read_meta(meta_path):
+    try:
+        with open(meta_path) as file:
+            return json.load(file)
+    except (OSError, ValueError):
+        return None
+
+
+def _write_meta(meta_path, meta):
+    temporary = f"{meta_path}.{os.getpid()}.tmp"
+    with open(temporary, 'w') as file:
+        json.dump(meta, file, indent=2)
+    os.replace(temporary, meta_path)
+
+
+def ensure_cache(path):
+    """
+    Path of the Parquet cache of a CSV, (re)building it when missing or when
+    the CSV's content hash no longer matches. The hash is only recomputed when
+    the file's size or modification time changed since it was last checked.
+    """
+    cache_path, meta_path = cache_paths(path)
+    stat = os.stat(path)
+    meta = _read_meta(meta_path)
+
+    if meta is not None and meta.get("version") == CACHE_VERSION and os.path.exists(cache_path):
+        if (meta.get("size"), meta.get("mtime_ns")) == (stat.st_size, stat.st_mtime_ns):
+            return cache_path
+        source_hash = file_hash(path)
+        if meta.get("source_hash") == source_hash:
+            _write_meta(meta_path, {**meta, "size": stat.st_size, "mtime_ns": stat.st_mtime_ns})
+            return cache_path
+    else:
+        source_hash = file_hash(path)
+
+    started = time.monotonic()
+    frame = convert(pd.read_csv(path))
+    os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+    temporary = f"{cache_path}.{os.getpid()}.tmp"
+    frame.to_parquet(temporary, index=False)
+    os.replace(temporary, cache_path)
+    _write_meta(meta_path, {
+        "version": CACHE_VERSION,
+        "source": os.path.abspath(path),
+        "source_hash": source_hash,
+        "size": stat.st_size,
+        "mtime_ns": stat.st_mtime_ns,
+        "rows": len(frame),
+        "build_seconds": round(time.monotonic() - started, 3),
+    })
+    return cache_path
+
+
+def read_dataset(path, columns=None):
+    """
+    DataFrame of a CSV, served from a typed columnar cache built on first use.
+    Only the requested columns are read from the cache. Without pyarrow (or
+    with DATASET_CACHE_DISABLED set) the CSV is parsed directly.
+    """
+    if DATASET_CACHE_DISABLED:
+        return pd.read_csv(path, usecols=columns)
+    if not PARQUET_AVAILABLE:
+        warnings.warn("pyarrow is not installed; reading CSVs without the dataset cache", stacklevel=2)
+        return pd.read_csv(path, usecols=columns)
+    frame = pd.read_parquet(ensure_cache(path), columns=columns)
+    return frame if columns is None else frame[list(columns)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build (or refresh) the columnar cache of dataset CSVs.")
+    parser.add_argument("paths", nargs="+", help="CSV files, e.g. data/stackoverflow_full.csv data/cleaned_resumes.csv")
+    args = parser.parse_args()
+
+    for path in args.paths:
+        cache_path = ensure_cache(path)
+        meta = _read_meta(cache_paths(path)[1])
+        print(f"{path}: {meta['rows']} rows, {os.path.getsize(path) / 1e6:.1f} MB CSV -> "
+              f"{os.path.getsize(cache_path) / 1e6:.1f} MB Parquet ({cache_path})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,301 @@
+import argparse
+import os
+import warnings
+from concurrent.futures import ProcessPoolExecutor
+from itertools import combinations
+
+import numpy as np
+import pandas as pd
+
+from common.datasets import read_dataset
+
+# Configuration (overridable through the environment)
+BOOTSTRAP_RESAMPLES = int(os.environ.get("BOOTSTRAP_RESAMPLES", "10000"))
+BOOTSTRAP_CHUNK = int(os.environ.get("BOOTSTRAP_CHUNK", "2000"))  # resamples drawn at once; bounds memory
+MIN_SUPPORT = int(os.environ.get("FAIRNESS_MIN_SUPPORT", "30"))  # smallest subgroup reported in intersectional tables
+
+# Protected attributes of the StackOverflow data that intersectional analysis combines by default
+PROTECTED_ATTRIBUTES = ['Gender', 'Age', 'Accessibility', 'MentalHealth', 'Country', 'EdLevel']
+
+# Id column of stackoverflow_full.csv (its saved index) and the name prediction records give it
+SOURCE_ID = 'Unnamed: 0'
+APPLICANT_ID = 'ApplicantId'
+
+# Column names of the saved fairness tables, in order
+METRIC_COLUMNS = {
+    'demographic_parity': 'Demographic Parity',
+    'false_positive_rate': 'False Positive Rate (Equalized Odds)',
+    'false_negative_rate': 'False Negative Rate (Equalized Odds)',
+    'qualified_rate': 'Qualified Rate (Predictive Rate Parity)',
+    'unqualified_rate': 'Unqualified Rate (Predictive Rate Parity)',
+}
+
+
+def attach_labels(predictions, source, label='Employed', key=APPLICANT_ID, source_key=SOURCE_ID):
+    """
+    Copy of predictions with the ground-truth label of each applicant, looked
+    up by id through a hash index on the source data (not by row position, so
+    sampled or reordered predictions get the right labels). Only the key and
+    label columns of source are needed.
+    """
+    if key not in predictions:
+        raise ValueError(f"Predictions have no {key} column; rerun them so each record carries its applicant id")
+    index = pd.Index(source[source_key])
+    if not index.is_unique:
+        raise ValueError(f"{source_key} is not unique in the source data")
+    positions = index.get_indexer(predictions[key])
+    if (positions < 0).any():
+        raise ValueError(f"{int((positions < 0).sum())} predictions have no matching {source_key} in the source data")
+
+    merged = predictions.copy()
+    merged[label] = source[label].to_numpy()[positions]
+    return merged
+
+
+def confusion_counts(groups, labels, decisions, n_groups):
+    """
+    Counts[group, label, decision] from integer-coded arrays in one bincount.
+    Rows with a negative group code (missing value) are skipped.
+    """
+    groups, labels, decisions = (np.asarray(values, dtype=np.int64) for values in (groups, labels, decisions))
+    valid = groups >= 0
+    cells = groups[valid] * 4 + labels[valid] * 2 + decisions[valid]
+    return np.bincount(cells, minlength=n_groups * 4).reshape(n_groups, 2, 2)
+
+
+def rates(counts):
+    """
+    Per-group rates from counts shaped (..., group, label, decision), so a
+    whole stack of tables (e.g. bootstrap resamples) is handled at once.
+    The false positive/negative rates are shares of the whole group, as the
+    evaluation scripts have always reported them; the predictive parity rates
+    are NaN for a group without qualified (or unqualified) applicants.
+    """
+    counts = np.asarray(counts, dtype=np.float64)
+    qualified = counts[..., 1, :].sum(axis=-1)
+    unqualified = counts[..., 0, :].sum(axis=-1)
+    size = qualified + unqualified
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return {
+            'demographic_parity': counts[..., :, 1].sum(axis=-1) / size,
+            'false_positive_rate': counts[..., 0, 1] / size,
+            'false_negative_rate': counts[..., 1, 0] / size,
+            'qualified_rate': counts[..., 1, 1] / qualified,
+            'unqualified_rate': counts[..., 0, 1] / unqualified,
+        }
+
+
+def gaps(group_rates):
+    """
+    Largest between-group difference for each fairness criterion: demographic
+    parity, equalized odds (worse of the two error rates) and predictive rate
+    parity (worse of the qualified and unqualified rates).
+    """
+    def spread(values):
+        # NaN only when no group has the rate at all
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore', RuntimeWarning)
+            return np.nanmax(values, axis=-1) - np.nanmin(values, axis=-1)
+
+    return {
+        'demographic_parity_gap': spread(group_rates['demographic_parity']),
+        'equalized_odds_gap': np.fmax(spread(group_rates['false_positive_rate']),
+                                      spread(group_rates['false_negative_rate'])),
+        'predictive_parity_gap': np.fmax(spread(group_rates['qualified_rate']),
+                                         spread(group_rates['unqualified_rate'])),
+    }
+
+
+def encode(data, protected='Gender', label='Employed', decision='Decision'):
+    """Integer codes for the protected attribute plus 0/1 label and decision arrays."""
+    groups, names = pd.factorize(data[protected], sort=True)
+    labels = data[label].to_numpy(dtype=np.int64)
+    decisions = data[decision].to_numpy(dtype=np.int64)
+    return groups, names, labels, decisions
+
+
+def fairness_table(data, protected='Gender', label='Employed', decision='Decision'):
+    """
+    Demographic parity, equalized odds and predictive rate parity for every
+    value of the protected column, computed from a single count over
+    group x label x decision. Returns a DataFrame indexed by group with the
+    columns of METRIC_COLUMNS.
+    """
+    groups, names, labels, decisions = encode(data, protected, label, decision)
+    return table_from_counts(confusion_counts(groups, labels, decisions, len(names)), names, protected)
+
+
+def table_from_counts(counts, names, protected='Gender'):
+    """fairness_table from counts shaped (group, label, decision) and the group values."""
+    return pd.DataFrame({METRIC_COLUMNS[name]: values for name, values in rates(counts).items()},
+                        index=pd.Index(names, name=protected))
+
+
+def factorize_columns(data, attributes):
+    """Integer codes and sorted values for each column, computed once and shared by every combination."""
+    return {column: pd.factorize(data[column], sort=True) for column in attributes}
+
+
+def subgroup_codes(factorized, attributes):
+    """
+    Subgroup code for every row over a combination of columns (-1 where any
+    value is missing) and a DataFrame of the values of each subgroup code.
+    Codes are combined as one mixed-radix integer and only the subgroups
+    that occur are kept, so the count never grows with the full cross product.
+    """
+    codes = [factorized[column][0] for column in attributes]
+    sizes = [max(len(factorized[column][1]), 1) for column in attributes]
+    valid = np.logical_and.reduce([code >= 0 for code in codes])
+    if np.prod(sizes, dtype=np.float64) < 2 ** 62:
+        keys = np.ravel_multi_index([code[valid] for code in codes], sizes)
+        occupied, inverse = np.unique(keys, return_inverse=True)
+        values = np.unravel_index(occupied, sizes)
+    else:
+        occupied, inverse = np.unique(np.stack([code[valid] for code in codes], axis=1), axis=0, return_inverse=True)
+        values = occupied.T
+
+    groups = np.full(len(valid), -1, dtype=np.int64)
+    groups[valid] = inverse.ravel()
+    subgroups = pd.DataFrame({column: np.asarray(factorized[column][1])[value]
+                              for column, value in zip(attributes, values)})
+    return groups, subgroups
+
+
+def intersectional_table(data, attributes, label='Employed', decision='Decision', min_support=MIN_SUPPORT,
+                         factorized=None):
+    """
+    Fairness of every subgroup over a combination of protected columns, e.g.
+    ['Gender', 'Country', 'Age'], from one count over subgroup x label x
+    decision. Without a decision column (raw applicant data) only the label
+    rate is reported. Subgroups with fewer than min_support rows are dropped.
+    Selection Ratio is a subgroup's positive rate over the overall rate
+    (below 0.8 fails the four-fifths rule). Pass factorize_columns() output as
+    factorized to reuse the column codes across combinations.
+    """
+    factorized = factorized or factorize_columns(data, attributes)
+    groups, subgroups = subgroup_codes(factorized, attributes)
+    labels = data[label].to_numpy(dtype=np.int64)
+    has_decisions = decision is not None and decision in data
+    decisions = data[decision].to_numpy(dtype=np.int64) if has_decisions else np.zeros_like(labels)
+    counts = confusion_counts(groups, labels, decisions, len(subgroups))
+    return subgroup_table(subgroups, counts, label, has_decisions, min_support)
+
+
+def subgroup_table(subgroups, counts, label='Employed', has_decisions=True, min_support=MIN_SUPPORT):
+    """intersectional_table from the subgroup values and their (subgroup, label, decision) counts."""
+    size = counts.sum(axis=(1, 2))
+    table = subgroups.assign(Count=size)
+    if has_decisions:
+        positive = counts[:, :, 1].sum(axis=1)
+        for name, values in rates(counts).items():
+            table[METRIC_COLUMNS[name]] = values
+    else:
+        positive = counts[:, 1, :].sum(axis=1)
+        table[f'{label} Rate'] = positive / np.maximum(size, 1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        table['Selection Ratio'] = positive / np.maximum(size, 1) / (positive.sum() / max(size.sum(), 1))
+    return table[table['Count'] >= min_support].reset_index(drop=True)
+
+
+def intersectional_report(data, attributes=PROTECTED_ATTRIBUTES, max_order=2, label='Employed', decision='Decision',
+                          min_support=MIN_SUPPORT):
+    """
+    intersectional_table for every combination of up to max_order of the
+    attributes, stacked into one long table with Attributes and Subgroup
+    columns (e.g. "Gender x Country", "Woman / Sweden").
+    """
+    factorized = factorize_columns(data, attributes)
+    return stack_report(attributes, max_order, lambda combination: intersectional_table(
+        data, combination, label, decision, min_support, factorized))
+
+
+def stack_report(attributes, max_order, table_for):
+    """Long report of table_for(combination) over every combination of up to max_order attributes."""
+    tables = []
+    for order in range(1, max_order + 1):
+        for combination in combinations(attributes, order):
+            table = table_for(list(combination))
+            subgroup = table[combination[0]].astype(str)
+            for column in combination[1:]:
+                subgroup = subgroup + ' / ' + table[column].astype(str)
+            tables.append(table.drop(columns=list(combination)).assign(
+                Attributes=' x '.join(combination), Subgroup=subgroup))
+    report = pd.concat(tables, ignore_index=True)
+    return report[['Attributes', 'Subgroup'] + [column for column in report if column not in ('Attributes', 'Subgroup')]]
+
+
+def _bootstrap_chunk(probabilities, rows, size, seed):
+    # Resampling rows with replacement only changes how many land in each
+    # group x label x decision cell, so drawing the cell counts is equivalent
+    counts = np.random.default_rng(seed).multinomial(rows, probabilities, size=size)
+    return gaps(rates(counts.reshape(size, -1, 2, 2)))
+
+
+def bootstrap_gaps(data, protected='Gender', label='Employed', decision='Decision',
+                   resamples=BOOTSTRAP_RESAMPLES, confidence=0.95, seed=None, workers=1, chunk_size=BOOTSTRAP_CHUNK):
+    """
+    Percentile bootstrap confidence intervals for the fairness gaps.
+    Resamples are drawn chunk_size at a time from the cell counts of one
+    encoding pass, so memory stays bounded and each resample costs a few
+    cells rather than a copy of the data. Chunks run on workers processes
+    and each gets its own child of seed, so results depend on seed but not
+    on workers. Returns a DataFrame indexed by gap with estimate, lower and
+    upper columns.
+    """
+    groups, names, labels, decisions = encode(data, protected, label, decision)
+    counts = confusion_counts(groups, labels, decisions, len(names))
+    rows = int(counts.sum())
+    probabilities = counts.ravel() / rows
+
+    sizes = [min(chunk_size, resamples - start) for start in range(0, resamples, chunk_size)]
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+    jobs = [(probabilities, rows, size, chunk_seed) for size, chunk_seed in zip(sizes, seeds)]
+    if workers > 1 and len(jobs) > 1:
+        with ProcessPoolExecutor(max_workers=min(workers, len(jobs))) as pool:
+            chunks = list(pool.map(_bootstrap_chunk, *zip(*jobs)))
+    else:
+        chunks = [_bootstrap_chunk(*job) for job in jobs]
+
+    estimate = gaps(rates(counts))
+    tail = (1 - confidence) / 2 * 100
+    results = {}
+    for name in estimate:
+        samples = np.concatenate([chunk[name] for chunk in chunks])
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore', RuntimeWarning)
+            lower, upper = np.nanpercentile(samples, [tail, 100 - tail])
+        results[name] = {'estimate': float(estimate[name]), 'lower': lower, 'upper': upper}
+    return pd.DataFrame.from_dict(results, orient='index')
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fairness metrics and bootstrap confidence intervals for predictions.")
+    parser.add_argument("predictions", help="predictions CSV with the protected column and Decision")
+    parser.add_argument("--protected", default="Gender")
+    parser.add_argument("--labels", help="source CSV to look Employed up in by applicant id "
+                                         "(default: the predictions already have it)")
+    parser.add_argument("--resamples", type=int, default=BOOTSTRAP_RESAMPLES)
+    parser.add_argument("--confidence", type=float, default=0.95)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workers", type=int, default=1, help="processes drawing resamples")
+    parser.add_argument("--intersect", help="comma-separated protected columns to analyse jointly, e.g. Gender,Country,Age")
+    parser.add_argument("--min-support", type=int, default=MIN_SUPPORT, help="smallest subgroup reported with --intersect")
+    args = parser.parse_args()
+
+    predictions = pd.read_csv(args.predictions)
+    if args.labels:
+        predictions = attach_labels(predictions, read_dataset(args.labels, columns=[SOURCE_ID, 'Employed']))
+
+    if args.intersect:
+        attributes = [column.strip() for column in args.intersect.split(",") if column.strip()]
+        print(intersectional_table(predictions, attributes, min_support=args.min_support).to_string())
+        return
+
+    print(fairness_table(predictions, protected=args.protected).to_string())
+    print()
+    print(bootstrap_gaps(predictions, protected=args.protected, resamples=args.resamples,
+                         confidence=args.confidence, seed=args.seed, workers=args.workers).to_string())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,160 @@
+import os
+import threading
+import time
+from collections import deque
+
+import numpy as np
+
+from common import metrics
+from common.fairness import gaps, rates
+
+# Configuration (overridable through the environment)
+FAIRNESS_WINDOW = int(os.environ.get("FAIRNESS_WINDOW", "10000"))  # recent decisions kept for windowed views
+
+DECISIONS = metrics.Counter("fairness_decisions_total", "Hiring decisions seen by the fairness monitor",
+                            ["source", "group", "decision"])
+SELECTION_RATE = metrics.Gauge("fairness_selection_rate", "Share of positive decisions per group since start-up",
+                               ["source", "group"])
+PARITY_GAP = metrics.Gauge("fairness_parity_gap", "Largest selection rate difference between groups since start-up",
+                           ["source"])
+
+
+def _rate(numerator, denominator):
+    return round(numerator / denominator, 4) if denominator else None
+
+
+def _number(value):
+    # JSON has no NaN; a rate no group has yet is reported as null
+    return None if value is None or np.isnan(value) else round(float(value), 4)
+
+
+class FairnessAccumulator:
+    """
+    Decision counts per group: [no, yes] over every decision plus the
+    label x decision cells of those whose ground truth is known. Adding a
+    decision is O(1); rates and gaps are derived when a snapshot is taken.
+    """
+
+    def __init__(self):
+        self.groups = {}
+
+    def add(self, group, decision, label=None):
+        cells = self.groups.setdefault(group, [0] * 6)
+        cells[decision] += 1
+        if label is not None:
+            cells[2 + label * 2 + decision] += 1
+
+    def merge(self, other):
+        for group, cells in other.groups.items():
+            mine = self.groups.setdefault(group, [0] * 6)
+            for i, count in enumerate(cells):
+                mine[i] += count
+        return self
+
+    def selection_rate(self, group):
+        no, yes = self.groups[group][:2]
+        return yes / (no + yes)
+
+    def parity_gap(self):
+        selection = [self.selection_rate(group) for group in self.groups]
+        return max(selection) - min(selection) if selection else 0.0
+
+    def snapshot(self):
+        names = sorted(self.groups, key=str)
+        labeled = np.array([self.groups[name][2:] for name in names], dtype=np.int64).reshape(len(names), 2, 2)
+        group_rates = rates(labeled)
+
+        groups = {}
+        for i, name in enumerate(names):
+            no, yes = self.groups[name][:2]
+            groups[str(name)] = {
+                "decisions": no + yes,
+                "selected": yes,
+                "selection_rate": _rate(yes, no + yes),
+                "labeled": int(labeled[i].sum()),
+                **{metric: _number(values[i]) for metric, values in group_rates.items()
+                   if metric != "demographic_parity"},
+            }
+
+        labeled_gaps = gaps(group_rates) if labeled.sum() else {}
+        return {
+            "decisions": sum(group["decisions"] for group in groups.values()),
+            "groups": groups,
+            "gaps": {
+                "demographic_parity_gap": round(self.parity_gap(), 4),
+                "equalized_odds_gap": _number(labeled_gaps.get("equalized_odds_gap")),
+                "predictive_parity_gap": _number(labeled_gaps.get("predictive_parity_gap")),
+            },
+        }
+
+
+class FairnessMonitor:
+    """
+    Live fairness of the decisions a process makes, per source (endpoint or
+    batch strategy). Totals since start-up are kept as accumulators, and the
+    last window decisions are kept so a snapshot can cover only the last N
+    decisions or the last few minutes. Thread-safe.
+    """
+
+    def __init__(self, window=FAIRNESS_WINDOW):
+        self.totals = {}
+        self.recent = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def record(self, source, group, decision, label=None):
+        group = "unknown" if group is None or group != group else group
+        decision = int(decision)
+        label = None if label is None or label != label else int(label)
+        with self._lock:
+            totals = self.totals.setdefault(source, FairnessAccumulator())
+            totals.add(group, decision, label)
+            self.recent.append((time.time(), source, group, decision, label))
+            selection_rate, parity_gap = totals.selection_rate(group), totals.parity_gap()
+        DECISIONS.inc(source=source, group=group, decision="yes" if decision else "no")
+        SELECTION_RATE.set(selection_rate, source=source, group=group)
+        PARITY_GAP.set(parity_gap, source=source)
+
+    def snapshot(self, source=None, last=None, minutes=None):
+        """
+        Fairness of every decision since start-up, or of the last `last`
+        decisions or last `minutes` minutes when given, optionally for a
+        single source. Windows reach back at most the kept recent decisions;
+        "complete" is False when older ones would have been needed.
+        """
+        accumulator = FairnessAccumulator()
+        complete = True
+        with self._lock:
+            if last is None and minutes is None:
+                for name, totals in self.totals.items():
+                    if source is None or name == source:
+                        accumulator.merge(totals)
+            else:
+                cutoff = time.time() - minutes * 60 if minutes is not None else None
+                matched = 0
+                for timestamp, name, group, decision, label in reversed(self.recent):
+                    if (cutoff is not None and timestamp < cutoff) or (last is not None and matched >= last):
+                        break
+                    if source is None or name == source:
+                        accumulator.add(group, decision, label)
+                        matched += 1
+                else:
+                    # Ran out of kept decisions; older ones only matter if some were dropped
+                    complete = (last is not None and matched >= last) or len(self.recent) < self.recent.maxlen
+
+        window = {"last": last, "minutes": minutes, "complete": complete}
+        return {"source": source, "window": window, **accumulator.snapshot()}
+
+    def sources(self):
+        with self._lock:
+            return sorted(self.totals)
+
+
+MONITOR = FairnessMonitor()
+
+
+def record(source, group, decision, label=None):
+    MONITOR.record(source, group, decision, label)
+
+
+def snapshot(source=None, last=None, minutes=None):
+    return MONITOR.snapshot(source, last, minutes)
@@ -0,0 +1,193 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+# Configuration (overridable through the environment)
+CACHE_PATH = os.environ.get(
+    "LLM_CACHE_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", ".cache", "llm_cache.sqlite"),
+)
+CACHE_MAX_ENTRIES = int(os.environ.get("LLM_CACHE_MAX_ENTRIES", "100000"))
+CACHE_MAX_BYTES = int(os.environ.get("LLM_CACHE_MAX_BYTES", str(512 * 1024 * 1024)))
+CACHE_TTL = float(os.environ.get("LLM_CACHE_TTL", str(30 * 24 * 3600)))  # seconds, 0 disables expiry
+CACHE_DISABLED = os.environ.get("LLM_CACHE_DISABLED", "").lower() in ("1", "true", "yes")
+
+# Run the (comparatively expensive) eviction sweep once every N writes
+EVICT_EVERY = 100
+
+
+def make_key(endpoint, payload):
+    """
+    Content address for an LLM call: a hash of the endpoint plus the request
+    payload (model, prompt or messages, options). Transport-only fields such
+    as "stream" are ignored so streamed and non-streamed calls share entries.
+    """
+    keyed = {k: v for k, v in payload.items() if k not in ("stream", "keep_alive")}
+    raw = json.dumps({"endpoint": endpoint, "payload": keyed}, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class LLMCache:
+    """
+    On-disk LLM response cache backed by SQLite.
+    Entries expire after ttl seconds and the least recently used ones are
+    evicted once the cache grows past max_entries or max_bytes.
+    Safe to share between threads and between processes.
+    """
+
+    def __init__(self, path=CACHE_PATH, max_entries=CACHE_MAX_ENTRIES,
+                 max_bytes=CACHE_MAX_BYTES, ttl=CACHE_TTL):
+        self.path = os.path.abspath(path)
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._writes = 0
+        self._stats_lock = threading.Lock()
+        self._local = threading.local()
+
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        conn = self._conn()
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                model TEXT,
+                response TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                created_at REAL NOT NULL,
+                last_access REAL NOT NULL
+            )
+            """
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_responses_last_access ON responses (last_access)")
+        conn.commit()
+
+    def _conn(self):
+        # sqlite3 connections cannot be shared across threads, so keep one per thread
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _count(self, name):
+        with self._stats_lock:
+            setattr(self, name, getattr(self, name) + 1)
+
+    def get(self, key):
+        """Return the cached response for key, or None on a miss."""
+        conn = self._conn()
+        row = conn.execute("SELECT response, created_at FROM responses WHERE key = ?", (key,)).fetchone()
+        now = time.time()
+
+        if row is None or (self.ttl and now - row[1] > self.ttl):
+            if row is not None:
+                conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                conn.commit()
+            self._count("misses")
+            return None
+
+        conn.execute("UPDATE responses SET last_access = ? WHERE key = ?", (now, key))
+        conn.commit()
+        self._count("hits")
+        return json.loads(row[0])
+
+    def put(self, key, response, model=None):
+        """Store a response under key, evicting old entries when needed."""
+        raw = json.dumps(response, ensure_ascii=False)
+        now = time.time()
+        conn = self._conn()
+        conn.execute(
+            "INSERT OR REPLACE INTO responses (key, model, response, size, created_at, last_access) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            (key, model, raw, len(raw), now, now),
+        )
+        conn.commit()
+
+        with self._stats_lock:
+            self._writes += 1
+            sweep = self._writes % EVICT_EVERY == 0
+        if sweep:
+            self.evict()
+
+    def evict(self):
+        """Drop expired entries, then least recently used ones until within limits."""
+        conn = self._conn()
+        removed = 0
+
+        if self.ttl:
+            removed += conn.execute(
+                "DELETE FROM responses WHERE created_at < ?", (time.time() - self.ttl,)
+            ).rowcount
+
+        entries, total_bytes = conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses").fetchone()
+        if entries > self.max_entries:
+            removed += conn.execute(
+                "DELETE FROM responses WHERE key IN "
+                "(SELECT key FROM responses ORDER BY last_access LIMIT ?)",
+                (entries - self.max_entries,),
+            ).rowcount
+
+        if total_bytes > self.max_bytes:
+            # Walk from the oldest entry until enough bytes have been freed
+            excess = total_bytes - self.max_bytes
+            stale = []
+            for key, size in conn.execute("SELECT key, size FROM responses ORDER BY last_access"):
+                stale.append((key,))
+                excess -= size
+                if excess <= 0:
+                    break
+            conn.executemany("DELETE FROM responses WHERE key = ?", stale)
+            removed += len(stale)
+
+        conn.commit()
+        with self._stats_lock:
+            self.evictions += removed
+        return removed
+
+    def clear(self):
+        """Remove every cached response."""
+        conn = self._conn()
+        conn.execute("DELETE FROM responses")
+        conn.commit()
+
+    def stats(self):
+        """Hit/miss counters for this process plus the current size on disk."""
+        entries, total_bytes = self._conn().execute(
+            "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses"
+        ).fetchone()
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "evictions": self.evictions,
+            "entries": entries,
+            "bytes": total_bytes,
+            "path": self.path,
+        }
+
+
+_default_cache = None
+_default_lock = threading.Lock()
+
+
+def get_cache():
+    """Return the process-wide shared cache, or None when LLM_CACHE_DISABLED is set."""
+    global _default_cache
+    if CACHE_DISABLED:
+        return None
+    if _default_cache is None:
+        with _default_lock:
+            if _default_cache is None:
+                _default_cache = LLMCache()
+    return _default_cache
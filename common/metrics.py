@@ -0,0 +1,255 @@
+import atexit
+import bisect
+import contextvars
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+# Configuration (overridable through the environment)
+METRICS_TEXTFILE = os.environ.get("METRICS_TEXTFILE")  # scripts write their metrics here on exit
+
+# Seconds buckets with a long tail for LLM round trips
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 5000)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def format_labels(names, values):
+    if not names:
+        return ""
+    escaped = (str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"') for value in values)
+    return "{" + ",".join(f'{name}="{value}"' for name, value in zip(names, escaped)) + "}"
+
+
+def format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Registry:
+    """Collection of metrics rendered together in the Prometheus text format."""
+
+    def __init__(self):
+        self.metrics = []
+        self._lock = threading.Lock()
+
+    def register(self, metric):
+        with self._lock:
+            self.metrics.append(metric)
+        return metric
+
+    def render(self):
+        with self._lock:
+            metrics = list(self.metrics)
+        lines = []
+        for metric in metrics:
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.type}")
+            lines.extend(metric.samples())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+
+class Metric:
+    type = "untyped"
+
+    def __init__(self, name, documentation, labelnames=(), registry=REGISTRY):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+        registry.register(self)
+
+    def _key(self, labels):
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+
+class Counter(Metric):
+    type = "counter"
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels):
+        with self._lock:
+            return self._values.get(self._key(labels), 0)
+
+    def samples(self):
+        with self._lock:
+            values = dict(self._values)
+        return [f"{self.name}{format_labels(self.labelnames, key)} {format_value(value)}"
+                for key, value in sorted(values.items())]
+
+
+class Gauge(Counter):
+    """Gauge that is either set directly or read from function() at render time."""
+
+    type = "gauge"
+
+    def __init__(self, name, documentation, labelnames=(), registry=REGISTRY, function=None):
+        super().__init__(name, documentation, labelnames, registry)
+        self.function = function
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+    def set(self, value, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def samples(self):
+        if self.function is not None:
+            try:
+                return [f"{self.name} {format_value(self.function())}"]
+            except Exception:
+                return []
+        return super().samples()
+
+
+class Histogram(Metric):
+    type = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), registry=REGISTRY, buckets=LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames, registry)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            counts, total = self._values.get(key, ([0] * (len(self.buckets) + 1), 0.0))
+            counts[bisect.bisect_left(self.buckets, value)] += 1
+            self._values[key] = (counts, total + value)
+
+    def samples(self):
+        with self._lock:
+            values = {key: (list(counts), total) for key, (counts, total) in self._values.items()}
+
+        lines = []
+        for key, (counts, total) in sorted(values.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                labels = format_labels(self.labelnames + ("le",), key + (format_value(float(bound)),))
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {format_value(total)}")
+            lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+STAGE_SECONDS = Histogram("pipeline_stage_seconds", "Time spent in each processing stage", ["stage"])
+PARSE_FAILURES = Counter("llm_parse_failures_total", "Model responses that could not be parsed", ["kind"])
+
+
+class RequestTimings:
+    """Per-request totals of stage time and event counts, summed across worker threads."""
+
+    def __init__(self):
+        self.started = time.monotonic()
+        self.stages = {}
+        self.counters = {}
+        self._lock = threading.Lock()
+
+    def add(self, stage, seconds):
+        with self._lock:
+            total, count = self.stages.get(stage, (0.0, 0))
+            self.stages[stage] = (total + seconds, count + 1)
+
+    def count(self, name, amount=1):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + amount
+
+    def elapsed(self):
+        return time.monotonic() - self.started
+
+    def summary(self):
+        with self._lock:
+            return {
+                "wall_seconds": round(self.elapsed(), 4),
+                "stages": {stage: {"seconds": round(total, 4), "count": count}
+                           for stage, (total, count) in sorted(self.stages.items())},
+                "counters": dict(self.counters),
+            }
+
+
+_current = contextvars.ContextVar("request_timings", default=None)
+
+
+def current():
+    """The RequestTimings of the request being handled, or None."""
+    return _current.get()
+
+
+@contextmanager
+def track_request():
+    timings = RequestTimings()
+    token = _current.set(timings)
+    try:
+        yield timings
+    finally:
+        _current.reset(token)
+
+
+def propagate(function):
+    """Wrap function so calls on pool threads report into the caller's RequestTimings."""
+    timings = _current.get()
+
+    def run(*args, **kwargs):
+        token = _current.set(timings)
+        try:
+            return function(*args, **kwargs)
+        finally:
+            _current.reset(token)
+
+    return run
+
+
+def record(stage, seconds):
+    STAGE_SECONDS.observe(seconds, stage=stage)
+    timings = _current.get()
+    if timings is not None:
+        timings.add(stage, seconds)
+
+
+def count(name, amount=1):
+    timings = _current.get()
+    if timings is not None:
+        timings.count(name, amount)
+
+
+def parse_failure(kind):
+    PARSE_FAILURES.inc(kind=kind)
+    count("parse_failures")
+
+
+@contextmanager
+def stage(name):
+    started = time.monotonic()
+    try:
+        yield
+    finally:
+        record(name, time.monotonic() - started)
+
+
+def render():
+    return REGISTRY.render()
+
+
+def write_textfile(path):
+    """Write the current metrics atomically, e.g. for node_exporter's textfile collector."""
+    temporary = f"{path}.{os.getpid()}.tmp"
+    with open(temporary, "w") as file:
+        file.write(render())
+    os.replace(temporary, path)
+
+
+if METRICS_TEXTFILE:
+    atexit.register(write_textfile, METRICS_TEXTFILE)
@@ -0,0 +1,437 @@
+import json
+import os
+import random
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager, nullcontext
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from common import metrics
+from common.llm_cache import get_cache, make_key
+from common.prompt_template import split_template
+
+# Configuration (overridable through the environment)
+OLLAMA_HOST = os.environ.get("OLLAMA_HOST", "http://localhost:11434")  # comma-separated for several servers
+CONNECT_TIMEOUT = float(os.environ.get("OLLAMA_CONNECT_TIMEOUT", "5"))
+READ_TIMEOUT = float(os.environ.get("OLLAMA_READ_TIMEOUT", "120"))
+MAX_RETRIES = int(os.environ.get("OLLAMA_MAX_RETRIES", "3"))
+BACKOFF_BASE = float(os.environ.get("OLLAMA_BACKOFF_BASE", "0.5"))
+BACKOFF_MAX = float(os.environ.get("OLLAMA_BACKOFF_MAX", "10"))
+MAX_CONCURRENCY = int(os.environ.get("OLLAMA_MAX_CONCURRENCY", "4"))
+POOL_SIZE = int(os.environ.get("OLLAMA_POOL_SIZE", "16"))
+RATE_LIMIT = float(os.environ.get("OLLAMA_RATE_LIMIT", "0"))  # requests per second across all hosts, 0 = unlimited
+RATE_BURST = int(os.environ.get("OLLAMA_RATE_BURST", "0"))  # requests allowed at once after idling, 0 = one second's worth
+PREFIX_REUSE = os.environ.get("OLLAMA_PREFIX_REUSE", "0") == "1"  # default for callers that offer prefix reuse
+PREFIX_CACHE_SIZE = int(os.environ.get("OLLAMA_PREFIX_CACHE_SIZE", "32"))  # primed prefixes kept per client
+
+# Status codes worth retrying (overloaded or restarting server)
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+# Status codes meaning the backend does not understand a raw/context request
+UNSUPPORTED_STATUSES = {400, 404, 422, 501}
+
+LLM_SECONDS = metrics.Histogram("ollama_request_seconds", "Ollama round-trip time, including retries",
+                                ["model", "endpoint"])
+LLM_REQUESTS = metrics.Counter("ollama_requests_total", "Ollama calls by outcome", ["model", "endpoint", "status"])
+CACHE_LOOKUPS = metrics.Counter("llm_cache_lookups_total", "LLM response cache lookups", ["result"])
+metrics.Gauge(
+    "llm_cache_hit_ratio", "Share of cache lookups served from the cache since start-up",
+    function=lambda: CACHE_LOOKUPS.value(result="hit") / max(
+        CACHE_LOOKUPS.value(result="hit") + CACHE_LOOKUPS.value(result="miss"), 1)
+)
+
+
+def observe_call(model, endpoint, status, seconds):
+    LLM_SECONDS.observe(seconds, model=model, endpoint=endpoint)
+    LLM_REQUESTS.inc(model=model, endpoint=endpoint, status=status)
+    metrics.record("llm", seconds)
+    metrics.count("llm_calls")
+
+
+def observe_cache(hit):
+    CACHE_LOOKUPS.inc(result="hit" if hit else "miss")
+    metrics.count("cache_hits" if hit else "cache_misses")
+
+
+class OllamaError(Exception):
+    """Raised when Ollama cannot produce a response after all retries."""
+
+    def __init__(self, message, status_code=None, body=None):
+        super().__init__(message)
+        self.status_code = status_code
+        self.body = body
+
+
+class TokenBucket:
+    """Allows rate acquisitions per second on average, with bursts of up to burst."""
+
+    def __init__(self, rate, burst=0):
+        self.rate = rate
+        self.capacity = burst or max(1.0, rate)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                delay = (1 - self.tokens) / self.rate
+            time.sleep(delay)
+
+
+class OllamaClient:
+    """
+    Thin HTTP client for the Ollama REST API.
+    Keeps one pooled keep-alive session, applies connect/read timeouts,
+    retries transient failures with jittered backoff and caps the number
+    of in-flight requests per host. With several hosts each request goes
+    to the least busy one and a retry prefers a different host; an optional
+    token bucket caps the overall request rate. Completed responses are
+    served from the optional LLMCache when the same request has been seen before.
+    """
+
+    def __init__(self, host=OLLAMA_HOST, connect_timeout=CONNECT_TIMEOUT,
+                 read_timeout=READ_TIMEOUT, max_retries=MAX_RETRIES,
+                 max_concurrency=MAX_CONCURRENCY, pool_size=POOL_SIZE, cache=None,
+                 rate_limit=RATE_LIMIT, rate_burst=RATE_BURST):
+        hosts = host.split(",") if isinstance(host, str) else list(host)
+        self.hosts = [(h if "://" in h else f"http://{h}").strip().rstrip("/") for h in hosts if h.strip()]
+        self.host = self.hosts[0]
+        self.limiter = TokenBucket(rate_limit, rate_burst) if rate_limit > 0 else None
+        self.timeout = (connect_timeout, read_timeout)
+        self.max_retries = max_retries
+        self.max_concurrency = max_concurrency
+        self.cache = cache
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+        self._host_slots = {}
+        self._slots_lock = threading.Lock()
+        self._assigned = {host: 0 for host in self.hosts}
+        self._turn = 0
+
+        # model -> False once a backend has shown it cannot continue from context tokens
+        self.prefix_support = {}
+        self._templates = {}
+        self._prefixes = OrderedDict()
+        self._prefixes_lock = threading.Lock()
+
+    def _slots(self, url):
+        # One semaphore per scheme://host:port so a single host is never flooded
+        netloc = urlsplit(url).netloc
+        with self._slots_lock:
+            if netloc not in self._host_slots:
+                self._host_slots[netloc] = threading.BoundedSemaphore(self.max_concurrency)
+            return self._host_slots[netloc]
+
+    @contextmanager
+    def _lease(self, avoid=None):
+        # Pick the host with the fewest requests assigned (round-robin on ties), skipping avoid if possible
+        with self._slots_lock:
+            candidates = [host for host in self.hosts if host != avoid] or self.hosts
+            self._turn += 1
+            host = min(candidates, key=lambda h: (self._assigned[h], (self.hosts.index(h) - self._turn) % len(self.hosts)))
+            self._assigned[host] += 1
+        try:
+            yield host
+        finally:
+            with self._slots_lock:
+                self._assigned[host] -= 1
+
+    def _backoff(self, attempt):
+        # Full jitter: sleep somewhere between 0 and the exponential ceiling
+        ceiling = min(BACKOFF_MAX, BACKOFF_BASE * (2 ** attempt))
+        time.sleep(random.uniform(0, ceiling))
+
+    def post(self, path, payload, stream=False, host=None):
+        """
+        POST a JSON payload to the given API path and return the response.
+        Raises OllamaError once retries are exhausted or on a non-retryable status.
+        Streaming callers must pick the host and hold its slot themselves while
+        reading the body.
+        """
+        last_error = None
+        failed = None
+
+        for attempt in range(self.max_retries + 1):
+            with nullcontext(host) if host else self._lease(avoid=failed) as target:
+                url = f"{target}{path}"
+                if self.limiter is not None:
+                    self.limiter.acquire()
+                try:
+                    with nullcontext() if stream else self._slots(url):
+                        response = self.session.post(url, json=payload, timeout=self.timeout, stream=stream)
+                except (requests.ConnectionError, requests.Timeout) as e:
+                    last_error = OllamaError(f"Request to {url} failed: {e}")
+                else:
+                    if response.status_code == 200:
+                        return response
+                    last_error = OllamaError(
+                        f"Error: {response.status_code}, {response.text}",
+                        status_code=response.status_code,
+                        body=response.text,
+                    )
+                    if response.status_code not in RETRY_STATUSES:
+                        raise last_error
+                failed = target
+
+            if attempt < self.max_retries:
+                self._backoff(attempt)
+
+        raise last_error
+
+    def request(self, path, payload, use_cache=True):
+        """
+        Non-streaming call returning the decoded JSON body.
+        Looks the payload up in the cache first unless use_cache is False.
+        """
+        cache = self.cache if use_cache else None
+        if cache is not None:
+            key = make_key(path, payload)
+            cached = cache.get(key)
+            observe_cache(cached is not None)
+            if cached is not None:
+                return cached
+
+        started = time.monotonic()
+        try:
+            body = self.post(path, payload).json()
+        except OllamaError:
+            observe_call(payload.get("model"), path, "error", time.monotonic() - started)
+            raise
+        observe_call(payload.get("model"), path, "ok", time.monotonic() - started)
+
+        if cache is not None:
+            cache.put(key, body, model=payload.get("model"))
+        return body
+
+    def generate(self, model, prompt, options=None, use_cache=True, **kwargs):
+        """Non-streaming /api/generate call; returns the decoded JSON body."""
+        payload = {"model": model, "prompt": prompt, "stream": False}
+        if options:
+            payload["options"] = options
+        payload.update(kwargs)
+        return self.request("/api/generate", payload, use_cache=use_cache)
+
+    def generate_stream(self, model, prompt, options=None, use_cache=True, **kwargs):
+        """
+        Streaming /api/generate call; yields response text fragments as Ollama
+        produces them. A cache hit yields the whole cached response at once, and
+        a completed stream is written back to the cache.
+        """
+        payload = {"model": model, "prompt": prompt, "stream": True}
+        if options:
+            payload["options"] = options
+        payload.update(kwargs)
+
+        cache = self.cache if use_cache else None
+        if cache is not None:
+            key = make_key("/api/generate", payload)
+            cached = cache.get(key)
+            observe_cache(cached is not None)
+            if cached is not None:
+                yield cached["response"]
+                return
+
+        parts = []
+        final = {}
+        started = time.monotonic()
+        status = "error"
+        try:
+            with self._lease() as host, self._slots(host):
+                response = self.post("/api/generate", payload, stream=True, host=host)
+                with response:
+                    for line in response.iter_lines():
+                        if not line:
+                            continue
+                        chunk = json.loads(line)
+                        if chunk.get("error"):
+                            raise OllamaError(f"Error: {chunk['error']}")
+                        text = chunk.get("response", "")
+                        if text:
+                            parts.append(text)
+                            yield text
+                        if chunk.get("done"):
+                            final = chunk
+                            status = "ok"
+                            break
+        finally:
+            observe_call(model, "/api/generate", status, time.monotonic() - started)
+
+        if cache is not None and final:
+            cache.put(key, {**final, "response": "".join(parts)}, model=model)
+
+    def chat(self, model, messages, options=None, use_cache=True, **kwargs):
+        """Non-streaming /api/chat call; returns the decoded JSON body."""
+        payload = {"model": model, "messages": messages, "stream": False}
+        if options:
+            payload["options"] = options
+        payload.update(kwargs)
+        return self.request("/api/chat", payload, use_cache=use_cache)
+
+    def prompt_template(self, model):
+        """
+        (head, tail) the model's prompt template puts around a user prompt,
+        as rendered by Ollama for a templated request, or None when the model
+        has no template or it uses constructs split_template cannot render.
+        """
+        if model not in self._templates:
+            show = self.post("/api/show", {"model": model}).json()
+            try:
+                self._templates[model] = split_template(show.get("template") or "{{ .Prompt }}",
+                                                        show.get("system") or "")
+            except ValueError:
+                self._templates[model] = None
+        return self._templates[model]
+
+    def prefix(self, model, text, options=None):
+        """
+        PromptPrefix for a prompt start shared by many completions. Prefixes
+        are kept (least recently used first out) so later requests with the
+        same job description skip priming as well.
+        """
+        key = (model, text, json.dumps(options, sort_keys=True))
+        with self._prefixes_lock:
+            prefix = self._prefixes.get(key)
+            if prefix is None:
+                prefix = PromptPrefix(self, model, text, options)
+                self._prefixes[key] = prefix
+                while len(self._prefixes) > PREFIX_CACHE_SIZE:
+                    self._prefixes.popitem(last=False)
+            self._prefixes.move_to_end(key)
+            return prefix
+
+
+class PromptPrefix:
+    """
+    A prompt prefix (typically the job description) evaluated once, with the
+    context tokens Ollama returns sent along with every continuation so the
+    server only has to process each suffix. Both calls use raw mode, because
+    the model's prompt template would otherwise be wrapped around each half;
+    the template is rendered here instead (head before the prefix, tail after
+    the suffix), so the model gets the same input as from the templated
+    full-prompt call. Backends that return no context or reject it, and
+    templates that cannot be rendered here, are remembered per model and
+    served by that plain full-prompt generate call instead.
+    """
+
+    def __init__(self, client, model, text, options=None):
+        self.client = client
+        self.model = model
+        self.text = text
+        self.options = options
+        self.context = None
+        self.tail = ""
+        self.supported = None  # unknown until primed
+        self._lock = threading.Lock()
+        self.stats = {
+            "prefix_tokens": 0,
+            "continuations": 0,
+            "fallbacks": 0,
+            "suffix_prompt_tokens": 0,
+            "reused_prefix_tokens": 0,
+        }
+
+    def _unsupported(self):
+        self.supported = False
+        self.context = None
+        self.client.prefix_support[self.model] = False
+
+    def prime(self):
+        """Evaluate the prefix if not done yet; returns whether continuations can use it."""
+        with self._lock:
+            if self.supported is not None:
+                return self.supported
+            if self.client.prefix_support.get(self.model) is False:
+                self.supported = False
+                return False
+
+            try:
+                template = self.client.prompt_template(self.model)
+                if template is None:
+                    self._unsupported()
+                    return False
+                head, self.tail = template
+                body = self.client.generate(
+                    self.model, head + self.text, options={**(self.options or {}), "num_predict": 1},
+                    use_cache=False, raw=True
+                )
+            except OllamaError as e:
+                if e.status_code in UNSUPPORTED_STATUSES:
+                    self._unsupported()
+                else:
+                    # Server trouble says nothing about support; retry priming next time
+                    return False
+                return self.supported
+
+            context = body.get("context")
+            if not isinstance(context, list) or not context:
+                self._unsupported()
+                return False
+
+            # Drop the token generated while priming so only the prefix remains
+            generated = body.get("eval_count") or 0
+            self.context = context[:len(context) - generated] if generated < len(context) else context
+            self.stats["prefix_tokens"] = len(self.context)
+            self.supported = True
+            return True
+
+    def generate(self, suffix, options=None, use_cache=True, **kwargs):
+        """/api/generate for prefix + suffix; returns the decoded JSON body."""
+        options = {**(self.options or {}), **(options or {})} or None
+        if self.prime():
+            try:
+                body = self.client.generate(
+                    self.model, suffix + self.tail, options=options, use_cache=use_cache,
+                    context=self.context, raw=True, **kwargs
+                )
+            except OllamaError as e:
+                if e.status_code not in UNSUPPORTED_STATUSES:
+                    raise
+                with self._lock:
+                    self._unsupported()
+            else:
+                with self._lock:
+                    self.stats["continuations"] += 1
+                    self.stats["suffix_prompt_tokens"] += body.get("prompt_eval_count") or 0
+                    self.stats["reused_prefix_tokens"] += self.stats["prefix_tokens"]
+                return body
+
+        with self._lock:
+            self.stats["fallbacks"] += 1
+        return self.client.generate(self.model, self.text + suffix, options=options, use_cache=use_cache, **kwargs)
+
+
+_default_client = None
+_default_lock = threading.Lock()
+
+
+def get_client():
+    """Return the process-wide shared client, creating it on first use."""
+    global _default_client
+    if _default_client is None:
+        with _default_lock:
+            if _default_client is None:
+                _default_client = OllamaClient(cache=get_cache())
+    return _default_client
+
+
+def configure_client(**kwargs):
+    """Replace the shared client, e.g. with other hosts or a rate limit for an offline run."""
+    global _default_client
+    with _default_lock:
+        _default_client = OllamaClient(cache=get_cache(), **kwargs)
+    return _default_client
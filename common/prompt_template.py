@@ -0,0 +1,238 @@
+import re
+
+# Stands in for the user prompt while rendering, so the template can be split around it
+PROMPT_MARK = "\x00prompt\x00"
+RESPONSE_MARK = "\x00response\x00"
+
+ACTION = re.compile(r'{{(-\s)?\s*(.*?)\s*(\s-)?}}', re.DOTALL)
+TOKEN = re.compile(r'\s*(?:("(?:[^"\\]|\\.)*"|`[^`]*`)|(\(|\))|(:=|,)|([$.\w][\w.$]*)|(\S))')
+
+# Fields Ollama passes to a template that play no part in a single plain user prompt
+EMPTY_FIELDS = {"Tools": None, "Suffix": "", "Think": False, "IsThinkSet": False, "ThinkLevel": "",
+                "ToolCalls": None, "Thinking": "", "ToolName": "", "Images": None}
+
+
+def truthy(value):
+    # Go templates treat false, 0, nil and empty strings, lists and maps as false
+    return bool(value)
+
+
+FUNCTIONS = {
+    "eq": lambda first, *others: any(first == other for other in others),
+    "ne": lambda first, second: first != second,
+    "not": lambda value: not truthy(value),
+    "and": lambda *values: next((value for value in values if not truthy(value)), values[-1]),
+    "or": lambda *values: next((value for value in values if truthy(value)), values[-1]),
+    "len": lambda value: len(value or ()),
+    "slice": lambda value, *bounds: _slice(value, bounds),
+    "index": lambda value, *keys: _index(value, keys),
+}
+
+
+def _slice(value, bounds):
+    # Go's slice x 1 2 is x[1:2] and slice x 1 is x[1:]
+    return value[bounds[0]:bounds[1] if len(bounds) > 1 else None] if bounds else value
+
+
+def _index(value, keys):
+    for key in keys:
+        value = value[key]
+    return value
+
+
+def _field(value, name):
+    if isinstance(value, dict) and name in value:
+        return value[name]
+    if name in EMPTY_FIELDS:
+        return EMPTY_FIELDS[name]
+    raise ValueError(f"Template field .{name} is not supported")
+
+
+def parse(template):
+    """Nested (kind, ...) nodes for the supported subset of Go's text/template syntax."""
+    nodes = []
+    stack = [(None, nodes)]
+    position = 0
+    pending_trim = False
+    for match in ACTION.finditer(template):
+        text = template[position:match.start()]
+        if pending_trim:
+            text = text.lstrip()
+        if match.group(1):
+            text = text.rstrip()
+        if text:
+            stack[-1][1].append(("text", text))
+        position = match.end()
+        pending_trim = bool(match.group(3))
+
+        action = match.group(2)
+        keyword, _, rest = action.partition(" ")
+        if action.startswith("/*"):
+            continue
+        if keyword in ("if", "with", "range"):
+            node = [keyword, [(rest, [])], None]
+            stack[-1][1].append(node)
+            stack.append((node, node[1][0][1]))
+        elif keyword == "else":
+            node = stack[-1][0]
+            if node is None:
+                raise ValueError("{{ else }} outside a block")
+            branch = rest.partition(" ")
+            if branch[0] == node[0] and node[0] != "range":
+                node[1].append((branch[2], []))
+                stack[-1] = (node, node[1][-1][1])
+            elif not rest:
+                node[2] = []
+                stack[-1] = (node, node[2])
+            else:
+                raise ValueError(f"Unsupported template action {{{{ {action} }}}}")
+        elif keyword == "end":
+            if stack[-1][0] is None:
+                raise ValueError("{{ end }} without a block")
+            stack.pop()
+        elif keyword in ("template", "define", "block", "break", "continue"):
+            raise ValueError(f"Unsupported template action {{{{ {action} }}}}")
+        else:
+            stack[-1][1].append(("action", action))
+    if len(stack) > 1:
+        raise ValueError("Unclosed template block")
+    text = template[position:]
+    if pending_trim:
+        text = text.lstrip()
+    if text:
+        nodes.append(("text", text))
+    return nodes
+
+
+class Renderer:
+    def __init__(self, root):
+        self.root = root
+        self.variables = {"$": root}
+
+    def tokens(self, expression):
+        tokens = []
+        for string, paren, operator, word, other in TOKEN.findall(expression):
+            if other:
+                raise ValueError(f"Unsupported template expression {expression!r}")
+            tokens.append(string or paren or operator or word)
+        return tokens
+
+    def value(self, token, dot):
+        if token.startswith('"'):
+            return bytes(token[1:-1], "utf-8").decode("unicode_escape")
+        if token.startswith('`'):
+            return token[1:-1]
+        if re.fullmatch(r'-?\d+', token):
+            return int(token)
+        if token in ("true", "false"):
+            return token == "true"
+        if token == ".":
+            return dot
+        head, *fields = token.split(".")
+        if head == "":
+            value = dot
+        elif head.startswith("$"):
+            if head not in self.variables:
+                raise ValueError(f"Undefined template variable {head}")
+            value = self.variables[head]
+        else:
+            raise ValueError(f"Unsupported template word {token!r}")
+        for name in fields:
+            value = _field(value, name)
+        return value
+
+    def command(self, tokens, dot):
+        # One command: a function applied to its arguments, or a single value
+        arguments = []
+        while tokens and tokens[0] != ")":
+            token = tokens.pop(0)
+            if token == "(":
+                arguments.append(self.command(tokens, dot))
+                if not tokens or tokens.pop(0) != ")":
+                    raise ValueError("Unbalanced parentheses in template")
+            else:
+                arguments.append(token)
+        if not arguments:
+            raise ValueError("Empty template expression")
+        first = arguments[0]
+        if isinstance(first, str) and first in FUNCTIONS:
+            return FUNCTIONS[first](*[self.evaluate(argument, dot) for argument in arguments[1:]])
+        if len(arguments) > 1:
+            raise ValueError(f"Unsupported template function {first!r}")
+        return self.evaluate(first, dot)
+
+    def evaluate(self, argument, dot):
+        return self.value(argument, dot) if isinstance(argument, str) else argument
+
+    def expression(self, expression, dot):
+        if "|" in expression:
+            raise ValueError(f"Unsupported template pipeline {expression!r}")
+        return self.command(self.tokens(expression), dot)
+
+    def declare(self, expression):
+        # "$a := x" or "$i, $m := x" -> (names, x)
+        names, separator, rest = expression.partition(":=")
+        if not separator:
+            return [], expression
+        return [name.strip() for name in names.split(",")], rest.strip()
+
+    def render(self, nodes, dot):
+        parts = []
+        for node in nodes:
+            kind = node[0]
+            if kind == "text":
+                parts.append(node[1])
+            elif kind == "action":
+                names, expression = self.declare(node[1])
+                value = self.expression(expression, dot)
+                if names:
+                    self.variables[names[0]] = value
+                elif value is not None:
+                    parts.append(str(value))
+            elif kind in ("if", "with"):
+                for condition, body in node[1]:
+                    value = self.expression(condition, dot)
+                    if truthy(value):
+                        parts.append(self.render(body, value if kind == "with" else dot))
+                        break
+                else:
+                    if node[2] is not None:
+                        parts.append(self.render(node[2], dot))
+            elif kind == "range":
+                names, expression = self.declare(node[1][0][0])
+                items = self.expression(expression, dot) or []
+                for index, item in enumerate(items):
+                    if len(names) == 2:
+                        self.variables[names[0]], self.variables[names[1]] = index, item
+                    elif names:
+                        self.variables[names[0]] = item
+                    parts.append(self.render(node[1][0][1], item))
+                if not items and node[2] is not None:
+                    parts.append(self.render(node[2], dot))
+        return "".join(parts)
+
+
+def render(template, prompt, system=""):
+    """
+    The text Ollama builds from a model template for one user prompt (and
+    the model's default system prompt). Covers the constructs model
+    templates use (if/else/with/range, variables, eq/ne/not/and/or/len/
+    slice/index); anything else raises ValueError. Like Ollama, a template
+    is cut where the response would go unless it iterates over .Messages.
+    """
+    messages = ([{"Role": "system", "Content": system}] if system else []) + [{"Role": "user", "Content": prompt}]
+    if re.search(r'\.Messages\b', template):
+        root = {"System": system, "Messages": messages, "Prompt": "", "Response": ""}
+    else:
+        root = {"System": system, "Prompt": prompt, "Response": RESPONSE_MARK}
+    text = Renderer(root).render(parse(template), root)
+    return text.partition(RESPONSE_MARK)[0]
+
+
+def split_template(template, system=""):
+    """(head, tail) a model template puts around a user prompt; ValueError if it cannot be rendered here."""
+    text = render(template, PROMPT_MARK, system)
+    if text.count(PROMPT_MARK) != 1:
+        raise ValueError("Template does not contain the prompt exactly once")
+    head, _, tail = text.partition(PROMPT_MARK)
+    return head, tail
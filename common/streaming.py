@@ -0,0 +1,195 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+from common.counterfactual import add_counterfactual_gender
+from common.fairness import (APPLICANT_ID, MIN_SUPPORT, SOURCE_ID, attach_labels, stack_report, subgroup_table,
+                             table_from_counts)
+
+# Configuration (overridable through the environment)
+STREAMING = os.environ.get("PIPELINE_STREAMING", "0") == "1"  # analysis scripts read their inputs in chunks
+STREAM_CHUNK_ROWS = int(os.environ.get("STREAM_CHUNK_ROWS", "100000"))  # rows held in memory at once
+
+
+def iter_chunks(path, columns=None, chunksize=STREAM_CHUNK_ROWS, dtype=None):
+    """
+    Yield a CSV as DataFrames of at most chunksize rows. Every chunk gets the
+    column types of the first one (an integer column that only shows decimals
+    later is widened to float), so chunked output is formatted like a
+    whole-file read. A column whose type cannot be kept raises ValueError;
+    pin it with dtype.
+    """
+    dtypes = None
+    start = 0
+    for chunk in pd.read_csv(path, usecols=columns, chunksize=chunksize, dtype=dtype):
+        if dtypes is None:
+            dtypes = chunk.dtypes
+        for name, expected in dtypes.items():
+            column = chunk[name]
+            if column.dtype == expected:
+                continue
+            if column.isna().all() or (pd.api.types.is_float_dtype(expected)
+                                        and pd.api.types.is_integer_dtype(column.dtype)):
+                chunk[name] = column.astype(expected)
+            else:
+                raise ValueError(
+                    f"Column {name!r} of {path} is {expected} in the first {chunksize} rows but {column.dtype} "
+                    f"from row {start}; pass dtype={{{name!r}: ...}} so every chunk is read the same way"
+                )
+        start += len(chunk)
+        yield chunk
+
+
+class ValueCounts:
+    """Mergeable Series.value_counts() of one column."""
+
+    def __init__(self, column):
+        self.column = column
+        self.counts = {}  # in order of first appearance, which value_counts keeps for ties
+
+    def update(self, chunk):
+        for value, count in chunk[self.column].value_counts(sort=False).items():
+            self.counts[value] = self.counts.get(value, 0) + int(count)
+        return self
+
+    def merge(self, other):
+        for value, count in other.counts.items():
+            self.counts[value] = self.counts.get(value, 0) + count
+        return self
+
+    def result(self):
+        counts = pd.Series(list(self.counts.values()), index=pd.Index(list(self.counts), name=self.column),
+                           name='count', dtype='int64')
+        return counts.sort_values(ascending=False, kind='stable')
+
+
+class GroupShares:
+    """Mergeable df.groupby(group)[column].value_counts(normalize=True).unstack()."""
+
+    def __init__(self, group, column):
+        self.group = group
+        self.column = column
+        self.counts = None
+
+    def _add(self, counts):
+        self.counts = counts if self.counts is None else self.counts.add(counts, fill_value=0).astype('int64')
+
+    def update(self, chunk):
+        self._add(chunk.groupby([self.group, self.column]).size())
+        return self
+
+    def merge(self, other):
+        if other.counts is not None:
+            self._add(other.counts)
+        return self
+
+    def result(self):
+        counts = self.counts.sort_index()
+        shares = counts / counts.groupby(level=0).transform('sum')
+        shares.name = 'proportion'
+        return shares.unstack()
+
+
+class SubgroupCounts:
+    """
+    Mergeable label x decision counts for every combination of values of
+    the given columns. Any sub-combination is a sum over these counts, so one
+    pass yields fairness_table and intersectional tables for all of them.
+    """
+
+    def __init__(self, attributes, label='Employed', decision='Decision'):
+        self.attributes = list(attributes)
+        self.label = label
+        self.decision = decision
+        self.has_decisions = None
+        self.counts = None
+
+    def _add(self, counts):
+        self.counts = counts if self.counts is None else self.counts.add(counts, fill_value=0).astype('int64')
+
+    def update(self, chunk):
+        if self.has_decisions is None:
+            self.has_decisions = self.decision is not None and self.decision in chunk
+        keys = self.attributes + [self.label] + ([self.decision] if self.has_decisions else [])
+        self._add(chunk.groupby(keys, dropna=False, observed=True).size())
+        return self
+
+    def merge(self, other):
+        if other.counts is not None:
+            self.has_decisions = other.has_decisions
+            self._add(other.counts)
+        return self
+
+    def cells(self, combination):
+        """Subgroup values (sorted, rows with a missing value left out) and their (subgroup, label, decision) counts."""
+        outcome = [self.label] + ([self.decision] if self.has_decisions else [])
+        counts = self.counts.groupby(level=list(combination) + outcome, dropna=True).sum()
+        keys = counts.index.droplevel(outcome)
+        subgroups = keys.unique().sort_values()
+        cells = np.zeros((len(subgroups), 2, 2), dtype=np.int64)
+        labels = counts.index.get_level_values(self.label).to_numpy(dtype=np.int64)
+        decisions = (counts.index.get_level_values(self.decision).to_numpy(dtype=np.int64)
+                     if self.has_decisions else np.zeros_like(labels))
+        np.add.at(cells, (subgroups.get_indexer(keys), labels, decisions), counts.to_numpy())
+        return subgroups.to_frame(index=False), cells
+
+    def fairness_table(self, protected='Gender'):
+        subgroups, cells = self.cells([protected])
+        return table_from_counts(cells, subgroups[protected].to_numpy(), protected)
+
+    def intersectional_table(self, combination, min_support=MIN_SUPPORT):
+        subgroups, cells = self.cells(combination)
+        return subgroup_table(subgroups, cells, self.label, self.has_decisions, min_support)
+
+    def intersectional_report(self, max_order=2, min_support=MIN_SUPPORT):
+        return stack_report(self.attributes, max_order,
+                            lambda combination: self.intersectional_table(combination, min_support))
+
+
+def aggregate(path, aggregates, columns=None, chunksize=STREAM_CHUNK_ROWS):
+    """Feed every chunk of a CSV to each aggregate in a single pass; returns the aggregates."""
+    for chunk in iter_chunks(path, columns=columns, chunksize=chunksize):
+        for aggregate in aggregates:
+            aggregate.update(chunk)
+    return aggregates
+
+
+def write_head(path, output_path, rows, chunksize=STREAM_CHUNK_ROWS):
+    """The first rows of a CSV written to output_path, reading no further than needed."""
+    written = 0
+    with open(output_path, 'w', newline='') as file:
+        for chunk in iter_chunks(path, chunksize=min(chunksize, max(rows, 1))):
+            part = chunk.iloc[:rows - written]
+            part.to_csv(file, header=written == 0, index=False)
+            written += len(part)
+            if written >= rows:
+                break
+    return written
+
+
+def write_counterfactuals(path, output_path, chunksize=STREAM_CHUNK_ROWS):
+    """
+    The applicants with a CounterfactualGender column, chunk by chunk.
+    Returns the Gender and CounterfactualGender values seen, in order of first appearance.
+    """
+    genders, counterfactuals = {}, {}
+    with open(output_path, 'w', newline='') as file:
+        for index, chunk in enumerate(iter_chunks(path, chunksize=chunksize)):
+            chunk = add_counterfactual_gender(chunk)
+            genders.update(dict.fromkeys(chunk['Gender'].unique()))
+            counterfactuals.update(dict.fromkeys(chunk['CounterfactualGender'].unique()))
+            chunk.to_csv(file, header=index == 0, index=False)
+    return list(genders), list(counterfactuals)
+
+
+def attach_labels_chunked(predictions, path, label='Employed', key=APPLICANT_ID, source_key=SOURCE_ID,
+                          chunksize=STREAM_CHUNK_ROWS):
+    """attach_labels, scanning the source CSV in chunks and keeping only the rows the predictions refer to."""
+    if key not in predictions:
+        raise ValueError(f"Predictions have no {key} column; rerun them so each record carries its applicant id")
+    wanted = pd.Index(predictions[key].unique())
+    matches = [chunk[chunk[source_key].isin(wanted)]
+               for chunk in iter_chunks(path, columns=[source_key, label], chunksize=chunksize)]
+    source = pd.concat(matches, ignore_index=True) if matches else pd.DataFrame(columns=[source_key, label])
+    return attach_labels(predictions, source, label, key, source_key)
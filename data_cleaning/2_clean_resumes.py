@@ -1,19 +1,11 @@
-import pandas as pd
-import re
+import os
+import sys
 
-# Load resumes
-resumes = pd.read_csv('data/UpdatedResumeDataSet.csv')
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from common.text_cleaning import clean_csv
 
-# Clean resume text
-def clean_text(text):
-    text = re.sub(r'\n', ' ', str(text))  # Remove line breaks
-    text = re.sub(r'\W', ' ', text)       # Remove special characters
-    text = re.sub(r'\s+', ' ', text)      # Remove multiple spaces
-    return text.lower().strip()
+# Clean resume text (lowercase, punctuation and line breaks as single spaces) in one pass per text,
+# streaming the file in chunks and keeping the Category column; large files are split across processes
+rows = clean_csv('data/UpdatedResumeDataSet.csv', 'data/cleaned_resumes.csv', column='Resume')
 
-# Apply cleaning
-resumes['Resume'] = resumes['Resume'].apply(clean_text)
-
-# Save cleaned resumes
-resumes[['Resume']].to_csv('data/cleaned_resumes.csv', index=False)
-print("Resumes cleaned and saved to 'cleaned_resumes.csv'")
+print(f"{rows} resumes cleaned and saved to 'cleaned_resumes.csv'")
@@ -1,5 +1,4 @@
 import React, { useState, useEffect } from 'react';
-import axios from 'axios';
 import './App.css';
 
 // Components
@@ -25,24 +24,65 @@ function App() {
 
     setLoading(true);
     setError(null);
+    setResults([]);
+    setSelectedCandidate(null);
     
     try {
-      const endpoint = mode === 'basic' 
-        ? 'http://localhost:8000/api/basic_hiring'
-        : 'http://localhost:8000/api/advanced_hiring';
-        
-      const response = await axios.post(endpoint, {
-        job_description: jobDescription,
-        model: model
+      // Stream evaluations so each candidate appears as soon as it has been scored
+      const response = await fetch('http://localhost:8000/api/hiring/stream', {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify({
+          job_description: jobDescription,
+          model: model,
+          mode: mode
+        })
       });
       
-      setResults(response.data.results);
-      if (response.data.results.length > 0) {
-        setSelectedCandidate(response.data.results[0]);
+      if (!response.ok) {
+        const body = await response.json().catch(() => ({}));
+        throw new Error(body.error || `HTTP ${response.status}`);
+      }
+      
+      const reader = response.body.getReader();
+      const decoder = new TextDecoder();
+      const received = [];
+      const failed = [];
+      let buffer = '';
+      
+      while (true) {
+        const { value, done } = await reader.read();
+        if (done) break;
+        buffer += decoder.decode(value, { stream: true });
+        
+        // The stream is newline-delimited JSON; keep any partial line for the next chunk
+        const lines = buffer.split('\n');
+        buffer = lines.pop();
+        
+        for (const line of lines) {
+          if (!line.trim()) continue;
+          const event = JSON.parse(line);
+          if (event.type !== 'result') continue;
+          
+          if (event.result.error && !event.result.evaluation) {
+            // Show failed candidates in the error box instead of silently leaving them out
+            console.error('Candidate evaluation failed:', event.result.error);
+            const name = (event.result.candidate && event.result.candidate.name) || `Candidate ${event.index + 1}`;
+            failed[event.index] = `${name}: ${event.result.error}`;
+            const messages = failed.filter(Boolean);
+            setError(`Could not evaluate ${messages.length} candidate${messages.length === 1 ? '' : 's'}: ${messages.join('; ')}`);
+            continue;
+          }
+          
+          // Keep candidate file order regardless of completion order
+          received[event.index] = event.result;
+          setResults(received.filter(Boolean));
+          setSelectedCandidate((current) => current || event.result);
+        }
       }
     } catch (err) {
       console.error('Error fetching data:', err);
-      setError(`Error: ${err.response?.data?.error || err.message}`);
+      setError(`Error: ${err.message}`);
     } finally {
       setLoading(false);
     }
@@ -122,7 +162,7 @@ function App() {
           </div>
           
           <div className="lg:col-span-2">
-            {loading ? (
+            {loading && !selectedCandidate ? (
               <LoadingSpinner />
             ) : selectedCandidate ? (
               <CandidateDetails 
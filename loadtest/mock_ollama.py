@@ -0,0 +1,257 @@
+import argparse
+import json
+import re
+import threading
+import time
+import zlib
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Defaults roughly matching a 7B model on a laptop GPU
+DEFAULT_LATENCY = 0.05  # fixed seconds per request (model load, scheduling)
+DEFAULT_JITTER = 0.0  # extra seconds, spread deterministically per prompt
+DEFAULT_PROMPT_RATE = 2000.0  # prompt tokens processed per second
+DEFAULT_TOKEN_RATE = 50.0  # output tokens generated per second
+
+# Prompt template reported by /api/show, in the style of Mistral's
+MOCK_TEMPLATE = "[INST] {{ if .System }}{{ .System }} {{ end }}{{ .Prompt }} [/INST]"
+
+
+def fraction(*parts):
+    """Deterministic number in [0, 1) derived from the given values."""
+    return zlib.crc32("\x1f".join(str(part) for part in parts).encode("utf-8")) / 2 ** 32
+
+
+def tokens(text):
+    return text.split()
+
+
+class MockOllama:
+    """
+    Deterministic stand-in for the Ollama /api/generate and /api/chat endpoints.
+    Answers are derived from a hash of the prompt, so the same prompt always
+    gets the same decision, confidence and score. Latency is a fixed cost plus
+    prompt and output tokens at the configured rates, and error_rate of the
+    first attempts at a prompt fail with error_status so client retries can be
+    exercised. Raw/context continuations are supported: context tokens are not
+    re-processed, like a warm KV cache.
+    """
+
+    def __init__(self, host="127.0.0.1", port=0, latency=DEFAULT_LATENCY, jitter=DEFAULT_JITTER,
+                 prompt_rate=DEFAULT_PROMPT_RATE, token_rate=DEFAULT_TOKEN_RATE,
+                 error_rate=0.0, error_status=503, yes_rate=0.6, seed=0):
+        self.latency = latency
+        self.jitter = jitter
+        self.prompt_rate = prompt_rate
+        self.token_rate = token_rate
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.yes_rate = yes_rate
+        self.seed = seed
+        self.counts = Counter()
+        self._attempts = Counter()
+        self._lock = threading.Lock()
+
+        mock = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, format, *args):
+                pass
+
+            def do_GET(self):
+                if self.path == "/mock/stats":
+                    self.send_json(200, mock.stats())
+                elif self.path in ("/api/tags", "/api/version"):
+                    self.send_json(200, {"models": [], "version": "mock"})
+                else:
+                    self.send_json(404, {"error": "not found"})
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length", 0))
+                try:
+                    payload = json.loads(self.rfile.read(length) or b"{}")
+                except ValueError:
+                    return self.send_json(400, {"error": "invalid JSON"})
+
+                if self.path == "/mock/reset":
+                    mock.reset()
+                    return self.send_json(200, mock.stats())
+                if self.path == "/api/show":
+                    return self.send_json(200, {"template": MOCK_TEMPLATE, "system": ""})
+                if self.path not in ("/api/generate", "/api/chat"):
+                    return self.send_json(404, {"error": "not found"})
+                mock.handle(self, self.path, payload)
+
+            def send_json(self, status, body):
+                data = json.dumps(body).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+        self.server = ThreadingHTTPServer((host, port), Handler)
+        self.server.daemon_threads = True
+        self.host = f"http://{host}:{self.server.server_address[1]}"
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def stats(self):
+        with self._lock:
+            return dict(self.counts)
+
+    def reset(self):
+        with self._lock:
+            self.counts.clear()
+            self._attempts.clear()
+
+    def answer(self, prompt, json_format=False):
+        """The canned completion for a prompt."""
+        def decide(key):
+            return fraction(self.seed, key, "decision") < self.yes_rate
+
+        def confidence(key):
+            return 50 + int(fraction(self.seed, key, "confidence") * 50)
+
+        def score(key):
+            return round(fraction(self.seed, key, "score"), 2)
+
+        if json_format:
+            ids = list(dict.fromkeys(re.findall(r"Candidate (C\d+):", prompt)))
+            if "mapping every candidate id to 'Yes' or 'No'" in prompt:
+                return json.dumps({item_id: "Yes" if decide(prompt + item_id) else "No" for item_id in ids})
+            return json.dumps({
+                item_id: {
+                    "decision": "yes" if decide(prompt + item_id) else "no",
+                    "confidence": confidence(prompt + item_id),
+                    "explanation": "The candidate's skills and experience were compared with the job requirements.",
+                }
+                for item_id in ids
+            })
+        if "Respond with ONLY a single number" in prompt:
+            return str(score(prompt))
+        if "one line per candidate" in prompt:
+            count = len(re.findall(r"^\s*Candidate \d+:", prompt, re.MULTILINE))
+            return "\n".join(f"{i + 1}: {score(prompt + str(i))}" for i in range(count))
+        if "Respond with 'Yes' or 'No'" in prompt or "Final Answer" in prompt:
+            return "Yes" if decide(prompt) else "No"
+        decision = "yes" if decide(prompt) else "no"
+        return (
+            f"DECISION: {decision}\n"
+            f"CONFIDENCE: {confidence(prompt)}%\n"
+            "EXPLANATION: The candidate's skills and experience were compared with the job requirements."
+        )
+
+    def handle(self, handler, path, payload):
+        if path == "/api/chat":
+            prompt = "\n".join(message.get("content", "") for message in payload.get("messages", []))
+        else:
+            prompt = payload.get("prompt", "")
+        context = payload.get("context") or []
+
+        with self._lock:
+            self.counts[path] += 1
+            self.counts["requests"] += 1
+            attempt = self._attempts[prompt]
+            self._attempts[prompt] += 1
+
+        # Fail the first attempts at a prompt with the configured probability
+        if self.error_rate and fraction(self.seed, prompt, attempt, "error") < self.error_rate:
+            with self._lock:
+                self.counts["errors"] += 1
+            return handler.send_json(self.error_status, {"error": "mock: injected failure"})
+
+        text = self.answer(prompt, payload.get("format") == "json")
+        output = tokens(text)
+        num_predict = (payload.get("options") or {}).get("num_predict")
+        if num_predict:
+            output = output[:num_predict]
+            text = " ".join(output)
+        prompt_tokens = tokens(prompt)
+
+        delay = (self.latency + self.jitter * fraction(self.seed, prompt, "latency")
+                 + len(prompt_tokens) / self.prompt_rate)
+        output_seconds = len(output) / self.token_rate
+        final = {
+            "model": payload.get("model"),
+            "done": True,
+            "prompt_eval_count": len(prompt_tokens),
+            "prompt_eval_duration": int(len(prompt_tokens) / self.prompt_rate * 1e9),
+            "eval_count": len(output),
+            "eval_duration": int(output_seconds * 1e9),
+        }
+        if path == "/api/generate":
+            final["context"] = list(context) + [zlib.crc32(token.encode("utf-8")) % 32000
+                                                for token in prompt_tokens + output]
+
+        time.sleep(delay)
+        if not payload.get("stream", True):
+            time.sleep(output_seconds)
+            if path == "/api/chat":
+                final["message"] = {"role": "assistant", "content": text}
+            else:
+                final["response"] = text
+            return handler.send_json(200, final)
+
+        handler.send_response(200)
+        handler.send_header("Content-Type", "application/x-ndjson")
+        handler.send_header("Transfer-Encoding", "chunked")
+        handler.end_headers()
+
+        def write(chunk):
+            line = json.dumps(chunk).encode("utf-8") + b"\n"
+            handler.wfile.write(b"%x\r\n%s\r\n" % (len(line), line))
+            handler.wfile.flush()
+
+        pieces = re.findall(r"\S+\s*", text)
+        for piece in pieces:
+            time.sleep(1 / self.token_rate)
+            if path == "/api/chat":
+                write({"message": {"role": "assistant", "content": piece}, "done": False})
+            else:
+                write({"response": piece, "done": False})
+        write({**final, "response": ""} if path == "/api/generate" else {**final, "message": {"role": "assistant", "content": ""}})
+        handler.wfile.write(b"0\r\n\r\n")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a deterministic mock Ollama server.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=11434)
+    parser.add_argument("--latency", type=float, default=DEFAULT_LATENCY, help="fixed seconds per request")
+    parser.add_argument("--jitter", type=float, default=DEFAULT_JITTER, help="max extra seconds per request")
+    parser.add_argument("--prompt-rate", type=float, default=DEFAULT_PROMPT_RATE, help="prompt tokens per second")
+    parser.add_argument("--token-rate", type=float, default=DEFAULT_TOKEN_RATE, help="output tokens per second")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="share of first attempts that fail")
+    parser.add_argument("--error-status", type=int, default=503)
+    parser.add_argument("--yes-rate", type=float, default=0.6, help="share of prompts answered yes")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    mock = MockOllama(args.host, args.port, args.latency, args.jitter, args.prompt_rate, args.token_rate,
+                      args.error_rate, args.error_status, args.yes_rate, args.seed)
+    print(f"Mock Ollama listening on {mock.host}")
+    try:
+        mock.server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,222 @@
+import argparse
+import csv
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import requests
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT)
+from loadtest.mock_ollama import MockOllama
+
+BASELINE_PATH = os.path.join(ROOT, "loadtest", "baselines.json")
+SOURCE_CSV = os.path.join(ROOT, "api", "candidates.csv")
+TOLERANCE = 0.2  # allowed slowdown in latency/throughput before a run is flagged
+# LIME is seeded from the candidate text and the mock answers by prompt hash, so calls per request repeat
+# exactly; only LIME budget cut-offs (which lower them) and, with --use-cache, identical requests missing
+# the cache at the same time make them vary
+CALLS_TOLERANCE = 0.01
+
+JOB_DESCRIPTION = (
+    "We are hiring a backend software engineer with strong Python and SQL skills, "
+    "experience building REST APIs and data pipelines, and a degree in computer science "
+    "or a related field. Cloud experience (AWS or GCP) and 3+ years in industry preferred."
+)
+
+
+def write_candidates(path, count):
+    """Candidate CSV of the requested size, cycling the sample rows with unique names."""
+    with open(SOURCE_CSV, newline="") as file:
+        reader = csv.DictReader(file)
+        fields, rows = reader.fieldnames, list(reader)
+
+    with open(path, "w", newline="") as file:
+        writer = csv.DictWriter(file, fieldnames=fields)
+        writer.writeheader()
+        for i in range(count):
+            row = dict(rows[i % len(rows)])
+            row["name"] = f"{row['name']} {i + 1}"
+            writer.writerow(row)
+
+
+def start_app(mock, workdir, use_cache):
+    """Import the Flask app against the mock server and serve it on a free port."""
+    os.environ["OLLAMA_HOST"] = mock.host
+    os.environ["JOBS_DB_PATH"] = os.path.join(workdir, "jobs.sqlite")
+    os.environ["LLM_CACHE_PATH"] = os.path.join(workdir, "llm_cache.sqlite")
+    if not use_cache:
+        os.environ["LLM_CACHE_DISABLED"] = "1"
+    sys.path.append(os.path.join(ROOT, "api"))
+
+    import app as api
+    from werkzeug.serving import WSGIRequestHandler, make_server
+
+    class QuietHandler(WSGIRequestHandler):
+        def log_request(self, *args, **kwargs):
+            pass
+
+    server = make_server("127.0.0.1", 0, api.app, threaded=True, request_handler=QuietHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return api, server, f"http://127.0.0.1:{server.server_port}"
+
+
+def summarize(latencies, errors, wall, calls, candidates):
+    completed = len(latencies)
+    total = completed + errors
+    return {
+        "requests": total,
+        "errors": errors,
+        "p50_seconds": round(float(np.percentile(latencies, 50)), 4) if latencies else None,
+        "p95_seconds": round(float(np.percentile(latencies, 95)), 4) if latencies else None,
+        "p99_seconds": round(float(np.percentile(latencies, 99)), 4) if latencies else None,
+        "mean_seconds": round(float(np.mean(latencies)), 4) if latencies else None,
+        "throughput_rps": round(completed / wall, 3) if wall else None,
+        "candidates_per_second": round(completed * candidates / wall, 3) if wall else None,
+        "llm_calls_per_request": round(calls / total, 3) if total else None,
+    }
+
+
+def run_scenario(url, mock, endpoint, concurrency, count, body):
+    """Send count requests to the endpoint with the given concurrency and summarize them."""
+    session = requests.Session()
+    adapter = requests.adapters.HTTPAdapter(pool_maxsize=concurrency)
+    session.mount("http://", adapter)
+
+    def send(_):
+        started = time.monotonic()
+        try:
+            response = session.post(f"{url}/api/{endpoint}", json=body, timeout=600)
+            ok = response.status_code == 200 and not any(
+                "error" in result for result in response.json().get("results", [])
+            )
+        except requests.RequestException:
+            ok = False
+        return ok, time.monotonic() - started
+
+    mock.reset()
+    started = time.monotonic()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        outcomes = list(pool.map(send, range(count)))
+    wall = time.monotonic() - started
+    calls = mock.stats().get("requests", 0)
+
+    latencies = [seconds for ok, seconds in outcomes if ok]
+    return latencies, len(outcomes) - len(latencies), wall, calls
+
+
+def compare(key, result, baseline, tolerance):
+    """Regression messages for one scenario against its stored baseline."""
+    if baseline is None:
+        return []
+    problems = []
+    for metric in ("p50_seconds", "p95_seconds", "p99_seconds"):
+        if result[metric] is not None and baseline.get(metric):
+            if result[metric] > baseline[metric] * (1 + tolerance):
+                problems.append(f"{key}: {metric} {result[metric]} > baseline {baseline[metric]}")
+    if result["throughput_rps"] is not None and baseline.get("throughput_rps"):
+        if result["throughput_rps"] < baseline["throughput_rps"] * (1 - tolerance):
+            problems.append(f"{key}: throughput_rps {result['throughput_rps']} < baseline {baseline['throughput_rps']}")
+    if result["llm_calls_per_request"] is not None and baseline.get("llm_calls_per_request"):
+        if result["llm_calls_per_request"] > baseline["llm_calls_per_request"] * (1 + CALLS_TOLERANCE):
+            problems.append(f"{key}: llm_calls_per_request {result['llm_calls_per_request']} "
+                            f"> baseline {baseline['llm_calls_per_request']}")
+    if result["errors"] > baseline.get("errors", 0):
+        problems.append(f"{key}: errors {result['errors']} > baseline {baseline.get('errors', 0)}")
+    return problems
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load-test the hiring API against a mock Ollama server.")
+    parser.add_argument("--endpoints", default="basic_hiring,advanced_hiring")
+    parser.add_argument("--concurrency", default="1,4", help="comma-separated concurrency levels")
+    parser.add_argument("--candidates", default="5,20", help="comma-separated candidate-file sizes")
+    parser.add_argument("--requests", type=int, default=8, help="requests per scenario")
+    parser.add_argument("--lime-samples", type=int, default=20)
+    parser.add_argument("--explanation-mode", default="llm", choices=["llm", "surrogate"])
+    parser.add_argument("--max-workers", type=int, default=None, help="per-request worker limit")
+    parser.add_argument("--use-cache", action="store_true", help="keep the LLM response cache enabled")
+    parser.add_argument("--latency", type=float, default=0.05, help="mock: fixed seconds per LLM call")
+    parser.add_argument("--jitter", type=float, default=0.0, help="mock: max extra seconds per LLM call")
+    parser.add_argument("--prompt-rate", type=float, default=2000.0, help="mock: prompt tokens per second")
+    parser.add_argument("--token-rate", type=float, default=500.0, help="mock: output tokens per second")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="mock: share of first attempts that fail")
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--save-baseline", action="store_true", help="store this run as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=TOLERANCE)
+    parser.add_argument("--output", help="write the full results as JSON")
+    args = parser.parse_args()
+
+    endpoints = [endpoint.strip() for endpoint in args.endpoints.split(",") if endpoint.strip()]
+    levels = [int(level) for level in args.concurrency.split(",")]
+    sizes = [int(size) for size in args.candidates.split(",")]
+
+    baselines = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as file:
+            baselines = json.load(file)
+
+    body = {
+        "job_description": JOB_DESCRIPTION,
+        "use_cache": args.use_cache,
+        "lime_samples": args.lime_samples,
+        "explanation_mode": args.explanation_mode,
+    }
+    if args.max_workers:
+        body["max_workers"] = args.max_workers
+
+    workdir = tempfile.mkdtemp(prefix="loadtest-")
+    mock = MockOllama(latency=args.latency, jitter=args.jitter, prompt_rate=args.prompt_rate,
+                      token_rate=args.token_rate, error_rate=args.error_rate).start()
+    api, server, url = start_app(mock, workdir, args.use_cache)
+
+    results = {}
+    regressions = []
+    try:
+        for size in sizes:
+            path = os.path.join(workdir, f"candidates_{size}.csv")
+            write_candidates(path, size)
+            api.candidate_store.path = path
+
+            for endpoint in endpoints:
+                for concurrency in levels:
+                    key = f"{endpoint}|candidates={size}|concurrency={concurrency}"
+                    latencies, errors, wall, calls = run_scenario(url, mock, endpoint, concurrency,
+                                                                  args.requests, body)
+                    result = summarize(latencies, errors, wall, calls, size)
+                    results[key] = result
+                    regressions.extend(compare(key, result, baselines.get(key), args.tolerance))
+                    print(f"{key:<48} p50={result['p50_seconds']}s p95={result['p95_seconds']}s "
+                          f"p99={result['p99_seconds']}s rps={result['throughput_rps']} "
+                          f"llm_calls/req={result['llm_calls_per_request']} errors={errors}")
+    finally:
+        server.shutdown()
+        mock.stop()
+
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump({"settings": vars(args), "results": results, "regressions": regressions}, file, indent=2)
+
+    if args.save_baseline:
+        baselines.update(results)
+        with open(args.baseline, "w") as file:
+            json.dump(baselines, file, indent=2, sort_keys=True)
+        print(f"Baseline saved to {args.baseline}")
+        return 0
+
+    if regressions:
+        print("\nRegressions against baseline:")
+        for problem in regressions:
+            print(f"  - {problem}")
+        return 1
+    print("\nNo regressions against baseline." if baselines else "\nNo baseline yet; run with --save-baseline.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())